@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# Micro-benchmark: cost of the debug messages of one propagator check if debug logging is disabled.
+#
+# Compares eager formatting (the way messages were written before hexlite.tracing)
+# with the deferred formatting of hexlite.tracing, for one check that verifies
+# a number of ground external atoms with a number of output tuples each.
+#
+# usage: python3 benchmarks/check_logging.py [verifications per check] [output tuples] [checks]
+
+import sys
+import os
+import timeit
+import pprint
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from hexlite import tracing
+import clingo
+
+def main():
+  verifications = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+  outputs = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+  checks = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+  logging.basicConfig(level=logging.WARNING)
+
+  name = 'ClingoProp(CSF):vG:'
+  outKnownTrue = frozenset([ (clingo.Function('c'+str(i)),) for i in range(0, outputs) ])
+  outUnknown = frozenset()
+  replacements = [ clingo.Function('aux_t_2_eatom', [clingo.Function('p'), clingo.Function('c'+str(i))]) for i in range(0, verifications) ]
+  outputtuple = (clingo.Function('c0'),)
+
+  def eager():
+    logging.debug(name+" outTrue {} outUnknown {}".format(pprint.pformat(outKnownTrue), pprint.pformat(outUnknown)))
+    for rep in replacements:
+      logging.debug(name+' checking if {} = {} with outputtuple {}'.format(str(True), rep, repr(outputtuple)))
+      logging.info("%s atom %s positively verified!", name, 'eatom')
+
+  def deferred():
+    tracing.debug("%s outTrue %s outUnknown %s", name, tracing.pformat(outKnownTrue), tracing.pformat(outUnknown))
+    for rep in replacements:
+      tracing.debug('%s checking if %s = %s with outputtuple %r', name, True, rep, outputtuple)
+      tracing.info("%s atom %s positively verified!", name, 'eatom')
+
+  for label, function in [('eager', eager), ('tracing', deferred)]:
+    seconds = min(timeit.repeat(function, number=checks, repeat=5))
+    print('{:8s} {:8.2f} microseconds per check ({} verifications, {} output tuples)'.format(
+      label, 1e6 * seconds / checks, verifications, outputs))
+
+if __name__ == '__main__':
+  main()
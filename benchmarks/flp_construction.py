@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# Benchmark: construction time of the FLP check program (explicitflpcheck.CheckOptimizedProgram).
+#
+# Compares the former construction (each ground rule formatted as text, parsed and grounded again)
+# with the construction of the ground program through the clingo backend,
+# for the ground programs of HEX programs (by default the programs of tests/suites/*.test).
+#
+# usage: python3 benchmarks/flp_construction.py [repetitions] [hexfile ...]
+
+import sys
+import os
+import glob
+import timeit
+import logging
+
+basedir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, basedir)
+sys.path.insert(0, os.path.join(basedir, 'plugins'))
+import hexlite
+import hexlite.rewriter as rewriter
+import hexlite.clingobackend as clingobackend
+import hexlite.explicitflpcheck as flp
+from hexlite.ast import shallowparser as shp
+import dlvhex
+import clingo
+
+import testplugin
+dlvhex.startRegistration(testplugin)
+testplugin.register()
+
+class NoPropagator:
+  # external atoms are not evaluated during construction
+  def init(self, init):
+    pass
+
+def ignoreMessage(code, message):
+  pass
+
+def groundProgram(hexfile):
+  '''
+  returns GroundProgramObserver with the ground program of hexfile
+  '''
+  with open(hexfile, 'r') as inf:
+    program = shp.parse(inf.read())
+  pcontext = hexlite.ProgramContext()
+  rewriter.classifyEAtomsInstallRewritingHandlers(pcontext)
+  rewritten, facts = rewriter.ProgramRewriter(pcontext, program, [], hexlite.Configuration()).rewrite()
+  po = flp.GroundProgramObserver()
+  cc = clingo.Control(logger=ignoreMessage)
+  cc.register_observer(po)
+  cc.add('base', (), shp.shallowprint(rewritten))
+  eaeval = clingobackend.EAtomEvaluator(clingobackend.ClaspContext())
+  cc.ground([('base', ())], clingobackend.GringoContext(eaeval))
+  # the observer receives the end of the step only in solve()
+  cc.solve(on_model=lambda mdl: False)
+  return po
+
+def testPrograms():
+  '''
+  returns the programs of all tests that are not commented out in tests/suites/*.test
+  '''
+  ret = []
+  for suite in sorted(glob.glob(os.path.join(basedir, 'tests', 'suites', '*.test'))):
+    with open(suite, 'r') as inf:
+      for line in inf:
+        parts = line.split()
+        if len(parts) > 0 and not parts[0].startswith('#'):
+          hexfile = os.path.join(basedir, 'tests', parts[0])
+          if hexfile not in ret:
+            ret.append(hexfile)
+  return ret
+
+def textProgram(po):
+  '''
+  the check program as list of rules in text format (as it was created before using the clingo backend)
+  '''
+  def prefixAtom(atom, prefix):
+    if atom[0] == '-':
+      return '-'+prefix+atom[1:]
+    else:
+      return prefix+atom
+  def ruleHeadAux(idx):
+    return 'aux_h('+str(idx)+')'
+  chauxatoms = dict([ (ichatom, prefixAtom(po.formatAtom(ichatom), 'aux_H')) for ichatom in po.chatoms ])
+  cmatoms = [ po.formatAtom(iatom) for iatom in po.atoms if iatom not in po.replatoms ]
+  cmatoms += chauxatoms.values()
+  prog = [ '{'+ruleHeadAux(idx)+'}.' for idx in range(0, len(po.allrules)) ]
+  prog += [ '{'+prefixAtom(a, 'aux_c')+'}.' for a in cmatoms ]
+  prog += [ '{'+a+'}:-'+prefixAtom(a, 'aux_c')+'.' for a in cmatoms ]
+  prog += [ ':-'+a+',not '+prefixAtom(a, 'aux_c')+'.' for a in cmatoms ]
+  prog += [ 'aux_smaller:-not '+a+','+prefixAtom(a, 'aux_c')+'.' for a in cmatoms ]
+  prog += [ ':-not aux_smaller.' ]
+  prog += [ str(f)+'.' for f in po.facts ]
+  for idx, rule in enumerate(po.allrules):
+    body = po.formatBody(rule)
+    prog.append(po.formatHead(rule[1], rule[2])+':-'+ruleHeadAux(idx)+(','+body if len(body) > 0 else '')+'.')
+  prog += [ po.formatAtom(iatm)+'|'+chauxatoms[iatm]+'.' for rule in po.chrules for iatm in rule[2] ]
+  return prog
+
+def constructText(po):
+  prog = textProgram(po)
+  cc = clingo.Control(logger=ignoreMessage)
+  if hasattr(cc, 'builder'):
+    # as before: one parse_program call per rule
+    with cc.builder() as b:
+      for rule in prog:
+        clingo.parse_program(rule, lambda ast: b.add(ast))
+  else:
+    cc.add('base', (), '\n'.join(prog))
+  cc.ground([('base', ())])
+  return cc
+
+def constructBackend(po):
+  return flp.CheckOptimizedProgram(po, lambda name: NoPropagator())
+
+def main():
+  repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+  hexfiles = sys.argv[2:]
+  if len(hexfiles) == 0:
+    hexfiles = testPrograms()
+  logging.basicConfig(level=logging.CRITICAL)
+
+  os.chdir(os.path.join(basedir, 'tests'))
+  totals = { 'text': 0.0, 'backend': 0.0 }
+  print('{:40s} {:>7s} {:>12s} {:>12s}'.format('program', 'rules', 'text [ms]', 'backend [ms]'))
+  for hexfile in hexfiles:
+    try:
+      po = groundProgram(hexfile)
+      assert(po.finished())
+    except Exception:
+      # programs that need command line options or other plugins
+      continue
+    text = min(timeit.repeat(lambda: constructText(po), number=1, repeat=repetitions))
+    backend = min(timeit.repeat(lambda: constructBackend(po), number=1, repeat=repetitions))
+    totals['text'] += text
+    totals['backend'] += backend
+    print('{:40s} {:7d} {:12.2f} {:12.2f}'.format(os.path.basename(hexfile), len(po.allrules), 1e3 * text, 1e3 * backend))
+  print('{:40s} {:>7s} {:12.2f} {:12.2f}'.format('total', '', 1e3 * totals['text'], 1e3 * totals['backend']))
+
+if __name__ == '__main__':
+  main()
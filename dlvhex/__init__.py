@@ -17,6 +17,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import logging
+import inspect
 
 #
 # used by plugins
@@ -29,8 +30,41 @@ TUPLE = 3
 class ExtSourceProperties:
   def __init__(self):
     self.provides_partial = False
+    self.deterministic = False
+    self.parallel = False
+    self.minimize_nogoods = False
+    # positions of predicate inputs
+    self.monotonic = set()
+    self.antimonotonic = set()
+    self.support_sets = False
+    self.complete_positive_support_sets = False
+    self.complete_negative_support_sets = False
   def setProvidesPartialAnswer(self, provides_partial):
     self.provides_partial = provides_partial
+  def setDeterministic(self, deterministic):
+    # same input always gives same output, even across runs (results may be cached on disk)
+    self.deterministic = deterministic
+  def setParallelEvaluation(self, parallel):
+    # CPU-bound atom that may be evaluated in worker processes (it must not use learn() or storeOutputAtom())
+    self.parallel = parallel
+  def setMinimizeNogoods(self, minimize):
+    # learn smaller nogoods by re-evaluating on fewer inputs (requires setProvidesPartialAnswer(True))
+    self.minimize_nogoods = minimize
+  def addMonotonicInputPredicate(self, argidx):
+    # more true atoms in the predicate input at argidx never make an output tuple false
+    self.monotonic.add(argidx)
+  def addAntimonotonicInputPredicate(self, argidx):
+    # more true atoms in the predicate input at argidx never make an output tuple true
+    self.antimonotonic.add(argidx)
+  def setSupportSets(self, support_sets):
+    # the atom learns support sets (nogoods) before search if dlvhex.learnSupportSets() is True
+    self.support_sets = support_sets
+  def setCompletePositiveSupportSets(self, complete):
+    # the atom is true iff the input part of one of its positive support sets is true
+    self.complete_positive_support_sets = complete
+  def setCompleteNegativeSupportSets(self, complete):
+    # the atom is false iff the input part of one of its negative support sets is true
+    self.complete_negative_support_sets = complete
   def addFiniteOutputDomain(self, argidx):
     pass
   def __getattr__(self, name):
@@ -43,6 +77,19 @@ class ExtSourceProperties:
     return Generic(name)
 
 def addAtom(name, inargumentspec, outargumentnum, props=None):
+  # the function may be defined with 'async def' (I/O-bound atoms, evaluated concurrently on an event loop)
+  _registerAtom(name, inargumentspec, outargumentnum, props, False)
+
+def addBatchAtom(name, inargumentspec, outargumentnum, props=None):
+  '''
+  register an external atom that is evaluated for many input tuples in one call:
+  the function gets a list of input argument tuples and returns a list
+  (in the same order) of collections of true output tuples
+  (batch atoms cannot use output(), outputUnknown(), or storeOutputAtom())
+  '''
+  _registerAtom(name, inargumentspec, outargumentnum, props, True)
+
+def _registerAtom(name, inargumentspec, outargumentnum, props, batch):
   global callingModule, eatoms
   if name in eatoms:
     raise Exception("atom with name {} registered by module {} already defined by module {}!".format(
@@ -51,9 +98,11 @@ def addAtom(name, inargumentspec, outargumentnum, props=None):
     func = getattr(callingModule, name) 
   except:
     raise Exception("could not get function for external atom {} in module {}".format(name, callingModule.__name__))
+  if batch and inspect.iscoroutinefunction(func):
+    raise Exception("batch external atom {} in module {} cannot be defined with 'async def'".format(name, callingModule.__name__))
   if props is None:
     props = ExtSourceProperties()
-  eatoms[name] = ExternalAtomHolder(name, inargumentspec, outargumentnum, props, callingModule, func)
+  eatoms[name] = ExternalAtomHolder(name, inargumentspec, outargumentnum, props, callingModule, func, batch)
 
 def output(tuple_):
   assert(isinstance(tuple_, tuple)) # because we store it in a set
@@ -79,11 +128,18 @@ def storeOutputAtom(args, sign=True):
   # WARNING if we do not find in the backend we warn and return an ID with None to let other backend code ignore this ID
   return currentEvaluation().backend.storeOutputAtom(args, sign)
 
-def getInputAtoms():
-  return currentEvaluation().input
+def getInputAtoms(predicate=None):
+  # all predicate input atoms, or only those of the given predicate (name or ID)
+  if predicate is None:
+    return currentEvaluation().input
+  return currentEvaluation().inputsOfPredicate(str(predicate))
+
+def getTrueInputAtoms(predicate=None):
+  return [ i for i in getInputAtoms(predicate) if i.isTrue() ]
 
-def getTrueInputAtoms():
-  return [ i for i in currentEvaluation().input if i.isTrue() ]
+def learnSupportSets():
+  # whether the current call should learn support sets with learn() instead of computing output
+  return currentEvaluation().learningSupportSets
 
 #
 # used by engine
@@ -110,12 +166,15 @@ class CurrentExternalAtomEvaluation:
   def __init__(self):
     self.reset()
 
-  def reset(self, inputTuple=(), inputs=frozenset(), backend=Backend(), holder=None):
+  def reset(self, inputTuple=(), inputs=frozenset(), backend=Backend(), holder=None, inputsByPredicate=None, learningSupportSets=False):
     # current input tuple (also passed directly to function, but for storeOutputAtom we need to know this, too)
     self.inputTuple = inputTuple
-    # frozen set of ID objects that are predicate input for the currently called external atom
+    # collection of ID objects that are predicate input for the currently called external atom
     # None if eatom does not take predicate input
     self.input = inputs
+    # index of self.input: key = predicate name, value = tuple of ID objects with this predicate
+    # None if the backend does not provide an index
+    self.inputsByPredicate = inputsByPredicate
     # tuples returned by the current/previously called external atom
     self.outputKnownTrue = set()
     self.outputUnknown = set()
@@ -123,6 +182,13 @@ class CurrentExternalAtomEvaluation:
     self.backend = backend
     # currently processed eatom holder
     self.holder = holder
+    # whether this call is for learning support sets
+    self.learningSupportSets = learningSupportSets
+
+  def inputsOfPredicate(self, predicate):
+    if self.inputsByPredicate is None:
+      return tuple([ i for i in self.input if i.tuple()[0] == predicate ])
+    return self.inputsByPredicate.get(predicate, ())
 
 # all data relevant to external atom evaluation (dlvhex.* API)
 currentEvaluationStorage = CurrentExternalAtomEvaluation()
@@ -136,18 +202,51 @@ def startRegistration(caller):
   callingModule = caller
 
 # called by engine before calling external atom function
-def startExternalAtomCall(input_tuple, inputs, backend, holder):
+def startExternalAtomCall(input_tuple, inputs, backend, holder, inputsByPredicate=None, learningSupportSets=False):
   '''
-  inputs: frozenset of all ClingoIDs that are relevant to the current eatom evaluation as predicate inputs
+  inputs: collection (tuple or frozenset) of all ClingoIDs that are relevant to the current eatom evaluation as predicate inputs
+  inputsByPredicate: dict from predicate name to tuple of the ClingoIDs in inputs with that predicate (or None)
+  learningSupportSets: whether dlvhex.learnSupportSets() returns True in this call
   '''
-  currentEvaluation().reset(input_tuple, inputs, backend, holder)
+  currentEvaluation().reset(input_tuple, inputs, backend, holder, inputsByPredicate, learningSupportSets)
 
 # called by engine after calling external atom function
 def cleanupExternalAtomCall():
   currentEvaluation().reset()
 
+class ExternalAtomCoroutine:
+  '''
+  used by engine to run the function of an async external atom concurrently with others:
+  awaiting this object runs the coroutine with its own CurrentExternalAtomEvaluation
+  (it is made current whenever the coroutine runs, so dlvhex.* calls of concurrent atoms do not interfere)
+  '''
+  def __init__(self, input_tuple, inputs, backend, holder, inputsByPredicate=None):
+    self.evaluation = CurrentExternalAtomEvaluation()
+    self.evaluation.reset(input_tuple, inputs, backend, holder, inputsByPredicate)
+    self.coroutine = holder.func(*input_tuple)
+
+  def __await__(self):
+    global currentEvaluationStorage
+    value, error = None, None
+    while True:
+      previous = currentEvaluationStorage
+      currentEvaluationStorage = self.evaluation
+      try:
+        if error is None:
+          step = self.coroutine.send(value)
+        else:
+          step = self.coroutine.throw(error)
+      except StopIteration as e:
+        return e.value
+      finally:
+        currentEvaluationStorage = previous
+      try:
+        value, error = (yield step), None
+      except BaseException as e:
+        value, error = None, e
+
 class ExternalAtomHolder:
-  def __init__(self, name, inspec, outnum, props, module, func):
+  def __init__(self, name, inspec, outnum, props, module, func, batch=False):
     assert(isinstance(name, str))
     self.name = name
     assert(isinstance(inspec, tuple) and all([isinstance(x, int) for x in inspec]))
@@ -158,6 +257,10 @@ class ExternalAtomHolder:
     self.props = props
     self.module = module
     self.func = func
+    # whether func evaluates a list of input tuples in one call
+    self.batch = batch
+    # whether func is defined with 'async def'
+    self.isasync = inspect.iscoroutinefunction(func)
     # this will be set by the engine
     self.executionHandler = None
 
@@ -31,18 +31,9 @@ class Aux:
   # truth of external atoms (in the papers "external replacement atoms")
   EAREPL = PREFIX+'t'
 
-  # auxiliary for rule heads in explicitflpcheck.RuleActivityProgram
-  RHPRED = PREFIX+'h'
-
-  # for explicitflpcheck.CheckOptimizedProgram
-  # auxilary for unnamed clasp atoms
+  # for explicitflpcheck.GroundProgramObserver
+  # auxilary for unnamed clasp atoms (in explanations)
   CLATOM = PREFIX+'C'
-  # auxiliary for atoms in compatible set
-  CSATOM = PREFIX+'c'
-  # auxiliary for atoms in choice heads 
-  CHATOM = PREFIX+'H'
-  # auxiliary for smaller atom
-  SMALLER = PREFIX+'smaller'
 
 def predEAtomRelevance(arity, eatomname):
   return Aux.EARELV+'_'+str(arity)+'_'+eatomname
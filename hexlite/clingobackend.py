@@ -23,6 +23,8 @@ import collections
 import itertools
 import pprint
 import traceback
+import asyncio
+import time
 
 import dlvhex
 
@@ -30,6 +32,9 @@ from . import common as hexlite
 from . import aux
 from .ast import shallowparser as shp
 from . import explicitflpcheck as flp
+from . import persistentcache
+from . import workerpool
+from . import tracing
 
 # assume that the main program has handled possible import problems
 import clingo
@@ -43,6 +48,18 @@ class ClaspContext:
   def __init__(self):
     self.propcontrol = None
     self.propagator = None
+    # key = symbol, value = ClingoID of term (interned, see term())
+    self.terms = {}
+  def term(self, sym):
+    '''
+    returns the ClingoID for a symbol that is a term and not an atom
+    (one instance per symbol, so repeated conversions do not allocate)
+    '''
+    ret = self.terms.get(sym, None)
+    if ret is None:
+      ret = ClingoID(self, SymLit(sym, None))
+      self.terms[sym] = ret
+    return ret
   def __call__(self, control, propagator):
     '''
     initialize context with control object
@@ -73,6 +90,8 @@ class SymLit:
   * sym is used as a non-predicate-input to an external atom (TODO ensure this is always true)
   * TODO document other cases
   '''
+  __slots__ = ('sym', 'lit')
+
   def __init__(self, sym, lit):
     self.sym = sym
     #if lit is None:
@@ -84,23 +103,29 @@ class SymLit:
 
 class ClingoID:
   # the ID class as passed to plugins, from view of Clingo backend
+  # (string value and tuple() are computed on first use)
+  __slots__ = ('ccontext', 'symlit', '_value', '_tuple')
+
   def __init__(self, ccontext, symlit):
     assert(isinstance(ccontext, ClaspContext))
     self.ccontext = ccontext
     self.symlit = symlit
-    self.__value = str(symlit.sym)
+    self._value = None
+    self._tuple = None
 
   def negate(self):
     return ClingoID(self.ccontext, SymLit(self.symlit.sym, -self.symlit.lit))
 
   def value(self):
-    return self.__value
+    if self._value is None:
+      self._value = str(self.symlit.sym)
+    return self._value
 
   def intValue(self):
     if self.symlit.sym.type == clingo.SymbolType.Number:
       return self.symlit.sym.number
     else:
-      raise Exception('intValue called on ID {} which is not a number!'.format(self.__value))
+      raise Exception('intValue called on ID {} which is not a number!'.format(self.value()))
 
   def isTrue(self):
     if not self.symlit.lit:
@@ -118,9 +143,11 @@ class ClingoID:
     return self.__assignment().value(self.symlit.lit) != None
 
   def tuple(self):
-    tup = tuple([ ClingoID(self.ccontext, SymLit(sym, None)) for sym in
-                  [clingo.Function(self.symlit.sym.name)]+self.symlit.sym.arguments])
-    return tup
+    if self._tuple is None:
+      term = self.ccontext.term
+      self._tuple = tuple([ term(sym) for sym in
+                            [clingo.Function(self.symlit.sym.name)]+self.symlit.sym.arguments])
+    return self._tuple
 
   def extension(self):
     '''
@@ -128,23 +155,19 @@ class ClingoID:
     fails if this ClingoID does not hold a constant
     '''
     if self.symlit.sym.type != clingo.SymbolType.Function or self.symlit.sym.arguments != []:
-      raise Exception("cannot call extension() on term that is not a constant. was called on {}".format(self.__value))
-    # extract all true atoms with matching predicate name
-    ret_atoms = [
-      x for x in dlvhex.getTrueInputAtoms()
-      if x.symlit.sym.type == clingo.SymbolType.Function and x.symlit.sym.name == self.__value ]
+      raise Exception("cannot call extension() on term that is not a constant. was called on {}".format(self.value()))
+    # extract all true atoms with matching predicate name (indexed by predicate name)
+    ret_atoms = dlvhex.getTrueInputAtoms(self.value())
     # convert into tuples of ClingoIDs without literal (they are terms, not atoms)
-    ret = frozenset([
-      tuple([ClingoID(self.ccontext, SymLit(term, None)) for term in x.symlit.sym.arguments])
-      for x in ret_atoms ])
-    #logging.warning("extension of {} returned {}".format(self.__value, repr(ret)))
+    ret = frozenset([ x.tuple()[1:] for x in ret_atoms ])
+    #logging.warning("extension of {} returned {}".format(self.value(), repr(ret)))
     return ret
 
   def __assignment(self):
     return self.ccontext.propcontrol.assignment
 
   def __str__(self):
-    return self.__value
+    return self.value()
 
   def __repr__(self):
     sign = ''
@@ -156,7 +179,9 @@ class ClingoID:
     return hash(self.symlit)
 
   def __eq__(self, other):
-    if isinstance(other, str):
+    if self is other:
+      return True
+    elif isinstance(other, str):
       return self.value() == other
     elif isinstance(other, int) and self.symlit.sym.type == clingo.SymbolType.Number:
       return self.intValue() == other
@@ -168,6 +193,23 @@ class ClingoID:
   def __getattr__(self, name):
     raise Exception("not (yet) implemented: ClingoID.{}".format(name))
 
+class PredicateInputs(tuple):
+  '''
+  tuple of ClingoID that are the predicate inputs of an external atom
+  with index byPredicate: key = predicate name, value = tuple of ClingoID with this predicate
+  '''
+  def __new__(cls, atoms):
+    self = tuple.__new__(cls, atoms)
+    self.byPredicate = predicateIndex(self)
+    return self
+
+def predicateIndex(atoms):
+  index = collections.defaultdict(list)
+  for x in atoms:
+    if x.symlit.sym.type == clingo.SymbolType.Function:
+      index[x.symlit.sym.name].append(x)
+  return dict([ (pred, tuple(predatoms)) for pred, predatoms in index.items() ])
+
 class EAtomEvaluator(dlvhex.Backend):
   '''
   Clingo-backend-specific evaluation of external atoms implemented in Python
@@ -177,16 +219,26 @@ class EAtomEvaluator(dlvhex.Backend):
 
   This is one object that evaluates all external atoms in the context of a clasp context.
   '''
-  def __init__(self, claspcontext):
+  def __init__(self, claspcontext, pool=None, asynclimit=10, asynctimeout=None):
     assert(isinstance(claspcontext, ClaspContext))
     self.ccontext = claspcontext
+    # workerpool.WorkerPool for atoms marked for parallel evaluation (or None)
+    self.pool = pool
+    # maximum number of concurrently running async external atoms
+    self.asynclimit = asynclimit
+    # maximum seconds for one call of an async external atom (or None)
+    self.asynctimeout = asynctimeout
+    # event loop for async external atoms (created on first use)
+    self.loop = None
     # keep list of learned nogoods so that we do not add the same one twice
     self.learnedNogoods = set()
+    # list of nogoods learned in learnSupportSets (None if not learning support sets)
+    self.supportSets = None
 
   def clingo2hex(self, term):
     assert(isinstance(term, clingo.Symbol))
     #logging.debug("convertClingoToHex got {} with type {}".format(repr(term), term.type))
-    return ClingoID(self.ccontext, SymLit(term, None))
+    return self.ccontext.term(term)
     #if term.type is clingo.SymbolType.Number:
     #  ret = term.number
     #elif term.type in [clingo.SymbolType.String, clingo.SymbolType.Function]:
@@ -222,7 +274,169 @@ class EAtomEvaluator(dlvhex.Backend):
     * cleans up
     * return result (known true tuples, unknown tuples)
     '''
-    # prepare input tuple
+    if holder.batch:
+      return EAtomEvaluator.evaluateBatch(self, holder, [ (inputtuple, predicateinputatoms) ])[0]
+    if holder.isasync:
+      return EAtomEvaluator.evaluateAsync(self, [ (holder, inputtuple, predicateinputatoms) ])[0]
+
+    input_arguments = self.convertInputTuple(holder, inputtuple)
+
+    # call external atom in plugin
+    dlvhex.startExternalAtomCall(input_arguments, predicateinputatoms, self, holder, self.inputIndex(predicateinputatoms))
+    try:
+      tracing.debug('calling plugin eatom with arguments %r', input_arguments)
+      holder.func(*input_arguments)
+      return self.convertOutput(holder, input_arguments, predicateinputatoms, dlvhex.currentEvaluation())
+    finally:
+      dlvhex.cleanupExternalAtomCall()
+
+  def convertOutput(self, holder, input_arguments, predicateinputatoms, evaluation):
+    '''
+    returns (known true tuples, unknown tuples) from the dlvhex.CurrentExternalAtomEvaluation of a call
+    '''
+    # sanity check
+    inconsistent = set.intersection(evaluation.outputKnownTrue, evaluation.outputUnknown)
+    if len(inconsistent) > 0:
+      raise Exception('external atom {} with arguments {} provided the following tuples both as true and unknown: {} partial interpretation is {}'.format(holder.name, repr(input_arguments), repr(inconsistent), repr(predicateinputatoms)))
+
+    # interpret output that is known to be true
+    outKnownTrue = self.convertOutputTuples(evaluation.outputKnownTrue)
+
+    # interpret output that is unknown whether it is false or true (in partial evaluation)
+    outUnknown = self.convertOutputTuples(evaluation.outputUnknown)
+    return outKnownTrue, outUnknown
+
+  def evaluateAsync(self, requests):
+    '''
+    Evaluate a list of (holder, inputtuple, predicateinputatoms) of async external atoms
+    concurrently on the event loop (at most asynclimit at the same time, each at most asynctimeout seconds).
+
+    * return list of results (known true tuples, unknown tuples) in the order of requests
+    '''
+    if len(requests) == 0:
+      return []
+    if self.loop is None:
+      self.loop = asyncio.new_event_loop()
+
+    async def evaluateOne(semaphore, holder, inputtuple, predicateinputatoms):
+      input_arguments = self.convertInputTuple(holder, inputtuple)
+      call = dlvhex.ExternalAtomCoroutine(input_arguments, predicateinputatoms, self, holder, self.inputIndex(predicateinputatoms))
+      async def run():
+        return await call
+      async with semaphore:
+        tracing.debug('calling plugin async eatom with arguments %r', input_arguments)
+        try:
+          await asyncio.wait_for(run(), self.asynctimeout)
+        except asyncio.TimeoutError:
+          raise Exception('external atom {} with arguments {} did not finish within {} seconds'.format(
+            holder.name, repr(input_arguments), self.asynctimeout))
+      return self.convertOutput(holder, input_arguments, predicateinputatoms, call.evaluation)
+
+    async def evaluateAll():
+      # create semaphore here so that it belongs to self.loop
+      semaphore = asyncio.Semaphore(self.asynclimit)
+      tasks = [ asyncio.ensure_future(evaluateOne(semaphore, holder, inputtuple, predicateinputatoms))
+                for holder, inputtuple, predicateinputatoms in requests ]
+      try:
+        return await asyncio.gather(*tasks)
+      except BaseException:
+        # do not leave running calls on the loop (e.g., if learn() aborted propagation)
+        for task in tasks:
+          task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+    return self.loop.run_until_complete(evaluateAll())
+
+  def evaluateBatch(self, holder, requests):
+    '''
+    Evaluate external atom for a list of (inputtuple, predicateinputatoms) pairs.
+
+    * batch atoms (registered with dlvhex.addBatchAtom) get all input tuples in one call
+    * other atoms are called once per input tuple
+    * return list of results (known true tuples, unknown tuples) in the order of requests
+    '''
+    if holder.isasync:
+      return EAtomEvaluator.evaluateAsync(self, [ (holder, inputtuple, predicateinputatoms)
+                                                  for inputtuple, predicateinputatoms in requests ])
+    if not holder.batch:
+      return [ EAtomEvaluator.evaluate(self, holder, inputtuple, predicateinputatoms)
+               for inputtuple, predicateinputatoms in requests ]
+
+    batch_arguments = [ tuple(self.convertInputTuple(holder, inputtuple)) for inputtuple, _ in requests ]
+    # the batch function sees the predicate inputs of all input tuples
+    # (extension() filters them by predicate name, so this is the same as for single calls)
+    if len(requests) == 1:
+      predicateinputatoms = requests[0][1]
+    else:
+      predicateinputatoms = PredicateInputs(sorted(
+        set(hexlite.flatten([ pia for _, pia in requests ])), key=lambda x: x.symlit.sym))
+
+    # call batch external atom in plugin (there is no single input tuple for storeOutputAtom)
+    dlvhex.startExternalAtomCall(None, predicateinputatoms, self, holder, self.inputIndex(predicateinputatoms))
+    try:
+      tracing.debug('calling plugin batch eatom with %d input tuples', len(batch_arguments))
+      outputs = list(holder.func(batch_arguments))
+      if len(outputs) != len(batch_arguments):
+        raise Exception('batch external atom {} returned {} outputs for {} input tuples'.format(
+          holder.name, len(outputs), len(batch_arguments)))
+      # batch atoms provide no partial answers: all returned tuples are true, all others are false
+      ret = [ (self.convertOutputTuples(out), []) for out in outputs ]
+    finally:
+      dlvhex.cleanupExternalAtomCall()
+    return ret
+
+  def evaluatesUpFront(self, holder):
+    '''
+    whether the propagator should collect all input tuples of holder and pass them to evaluateBatches
+    '''
+    return holder.batch or holder.isasync or self.evaluatesInPool(holder)
+
+  def evaluatesInPool(self, holder):
+    return self.pool is not None and holder.props.parallel and not holder.batch and not holder.isasync
+
+  def evaluateBatches(self, batches):
+    '''
+    Evaluate a list of (holder, requests) where requests are as in evaluateBatch.
+
+    * atoms marked for parallel evaluation are first submitted to the worker pool (all of them run concurrently)
+    * then all async atoms are evaluated together on the event loop
+    * then all other atoms are evaluated with evaluateBatch
+    * return list of result lists in the order of batches
+    '''
+    assignment = self.ccontext.propcontrol.assignment
+    # key = index in batches, value = list of handles
+    submitted = {}
+    for bidx, (holder, requests) in enumerate(batches):
+      if self.evaluatesInPool(holder):
+        submitted[bidx] = [ self.pool.submit(holder, inputtuple, predicateinputatoms, assignment)
+                            for inputtuple, predicateinputatoms in requests ]
+    asyncbatches = [ bidx for bidx, (holder, _) in enumerate(batches) if holder.isasync ]
+    asyncresults = iter(EAtomEvaluator.evaluateAsync(self, [
+      (batches[bidx][0], inputtuple, predicateinputatoms)
+      for bidx in asyncbatches for inputtuple, predicateinputatoms in batches[bidx][1] ]))
+    ret = []
+    for bidx, (holder, requests) in enumerate(batches):
+      if bidx in submitted:
+        ret.append([ self.pool.result(handle) for handle in submitted[bidx] ])
+      elif holder.isasync:
+        ret.append([ next(asyncresults) for _ in requests ])
+      else:
+        ret.append(EAtomEvaluator.evaluateBatch(self, holder, requests))
+    return ret
+
+  def inputIndex(self, predicateinputatoms):
+    '''
+    returns index of predicate inputs by predicate name (precomputed by the propagator if possible)
+    '''
+    if isinstance(predicateinputatoms, PredicateInputs):
+      return predicateinputatoms.byPredicate
+    return predicateIndex(predicateinputatoms)
+
+  def convertInputTuple(self, holder, inputtuple):
+    '''
+    convert clingo input tuple into list of arguments for the external atom function
+    '''
     input_arguments = []
     for spec_idx, inp in enumerate(holder.inspec):
       if inp in [dlvhex.PREDICATE, dlvhex.CONSTANT]:
@@ -236,29 +450,13 @@ class EAtomEvaluator(dlvhex.Backend):
         input_arguments.append(tuple(args))
       else:
         raise Exception("unknown input type "+repr(inp))
+    return input_arguments
 
-    # call external atom in plugin
-    dlvhex.startExternalAtomCall(input_arguments, predicateinputatoms, self, holder)
-    outKnownTrue, outUnknown = set(), set()
-    try:
-      logging.debug('calling plugin eatom with arguments '+repr(input_arguments))
-      holder.func(*input_arguments)
-      
-      # sanity check
-      inconsistent = set.intersection(dlvhex.currentEvaluation().outputKnownTrue, dlvhex.currentEvaluation().outputUnknown)
-      if len(inconsistent) > 0:
-        raise Exception('external atom {} with arguments {} provided the following tuples both as true and unknown: {} partial interpretation is {}'.format(holder.name, repr(input_arguments), repr(inconsistent), repr(predicateinputatoms)))
-
-      # interpret output that is known to be true
-      outKnownTrue = [ tuple([ self.hex2clingo(val) for val in _tuple ])
-                       for _tuple in dlvhex.currentEvaluation().outputKnownTrue ]
-
-      # interpret output that is unknown whether it is false or true (in partial evaluation)
-      outUnknown = [ tuple([ self.hex2clingo(val) for val in _tuple ])
-                     for _tuple in dlvhex.currentEvaluation().outputUnknown ]
-    finally:
-      dlvhex.cleanupExternalAtomCall()
-    return outKnownTrue, outUnknown
+  def convertOutputTuples(self, tuples):
+    '''
+    convert output tuples of external atom function into list of clingo tuples
+    '''
+    return [ tuple([ self.hex2clingo(val) for val in _tuple ]) for _tuple in tuples ]
   
   # implementation of Backend method
   def storeAtom(self, tpl):
@@ -270,16 +468,20 @@ class EAtomEvaluator(dlvhex.Backend):
     (because we do not invent new variables and we cannot access variables that are not about our predicate inputs)
 
     so we only need to check if tpl is in predicateinputatoms and return the corresponding ClingoID
+    (the propagator indexes all predicate inputs by symbol, and predicateinputatoms contains
+    all atoms of its predicates, so it is sufficient to check that the predicate is one of them)
     '''
     match_name = tpl[0].symlit.sym.name
-    match_arguments = [t.symlit.sym for t in tpl[1:]]
-    #print("match_name = {} match_arguments = {}".format(repr(match_name), repr(match_arguments)))
-    for x in dlvhex.currentEvaluation().input:
-      #print("comparing {} with {}".format(repr(x), repr(tpl)))
-      #print("xsxn {} xssa {}".format(repr(x.symlit.sym.name), repr(x.symlit.sym.arguments)))
-      if x.symlit.sym.name == match_name and x.symlit.sym.arguments == match_arguments:
-        #print("found {}".format(repr(x)))
+    match_sym = clingo.Function(match_name, [t.symlit.sym for t in tpl[1:]])
+    if self.ccontext.propagator is not None:
+      x = self.ccontext.propagator.inputsBySymbol.get(match_sym, None)
+      if x is not None and len(dlvhex.currentEvaluation().inputsOfPredicate(match_name)) > 0:
         return x
+    else:
+      # no propagator (e.g., in a worker process)
+      for x in dlvhex.currentEvaluation().input:
+        if x.symlit.sym == match_sym:
+          return x
     logging.warning("storeAtom() called with tuple {} that cannot be stored because it is not part of the predicate input or not existing in the ground rewriting (we have no liberal safety)".format(repr(tpl)))
     return None
 
@@ -296,79 +498,156 @@ class EAtomEvaluator(dlvhex.Backend):
     #logging.debug("got dlvhex.currentEvaluation().holder.name {}".format(dlvhex.currentEvaluation().holder.name))
     #logging.debug("got self.ccontext.propagator.eatomVerifications[dlvhex.currentEvaluation().holder.name] {}".format(repr([ x.replacement.sym for x in self.ccontext.propagator.eatomVerifications[dlvhex.currentEvaluation().holder.name]])))
 
-    match_args = [t.symlit.sym for t in itertools.chain(dlvhex.currentEvaluation().inputTuple, args)]
+    if dlvhex.currentEvaluation().inputTuple is None:
+      raise Exception("storeOutputAtom() cannot be used in batch external atom {}".format(dlvhex.currentEvaluation().holder.name))
+    match_args = tuple([t.symlit.sym for t in itertools.chain(dlvhex.currentEvaluation().inputTuple, args)])
     #print("looking up {}".format(repr(match_args)))
-    # find those verification objects that contain the tuple to be stored
-    for x in self.ccontext.propagator.eatomVerifications[dlvhex.currentEvaluation().holder.name]:
-      #print("comparing {}".format(repr(x.replacement.sym.arguments)))
-      if x.replacement.sym.arguments == match_args:
-        #print("for storeOutputAtom({},{}) found replacement {}".format(repr(args), repr(sign), repr(x.replacement)))
-        return ClingoID(self.ccontext, x.replacement)
-    #  if x.symlit.sym.name == match_name and x.symlit.sym.arguments == match_arguments:
+    # find the replacement atom with the tuple to be stored
+    replacement = self.ccontext.propagator.replacements.get((dlvhex.currentEvaluation().holder.name, match_args), None)
+    if replacement is not None:
+      return ClingoID(self.ccontext, replacement)
     logging.warning("did not find literal to return in storeOutputAtom for {} will return None".format(repr(args)))
     return None
 
   # implementation of Backend method
   def learn(self, ng):
-    if __debug__:
-      logging.debug("learning user-specified nogood "+repr(ng))
+    tracing.debug("learning user-specified nogood %r", ng)
+    if self.supportSets is not None:
+      if any([ clingoid is None for clingoid in ng ]):
+        logging.info("learn() skips support set with atoms that do not exist in the ground rewriting")
+      else:
+        self.supportSets.append(tuple(ng))
+      return
     assert(all([isinstance(clingoid, ClingoID) for clingoid in ng]))
     ng = tuple(ng) # make sure it is hashable
     if ng in self.learnedNogoods:
-      logging.info("learn() skips adding known nogood")
+      tracing.info("learn() skips adding known nogood")
     else:
       self.learnedNogoods.add(ng)
       nogood = self.ccontext.propagator.Nogood()
       for clingoid in ng:
         if not nogood.add(clingoid.symlit.lit):
-          logging.debug("cannot build nogood (opposite literals)!")
+          tracing.debug("cannot build nogood (opposite literals)!")
           return
-      logging.info("learn() adds nogood %s", repr(nogood.literals))
+      tracing.info("learn() adds nogood %r", nogood.literals)
       self.ccontext.propagator.addNogood(nogood)
 
+  def learnSupportSets(self, holder, inputtuple, predicateinputatoms):
+    '''
+    calls the external atom function such that dlvhex.learnSupportSets() returns True
+    and returns the nogoods learned in this call (tuples of ClingoID) instead of adding them to the solver
+    '''
+    input_arguments = self.convertInputTuple(holder, inputtuple)
+    dlvhex.startExternalAtomCall(input_arguments, predicateinputatoms, self, holder,
+      self.inputIndex(predicateinputatoms), learningSupportSets=True)
+    self.supportSets = []
+    try:
+      tracing.debug('calling plugin eatom for learning support sets with arguments %r', input_arguments)
+      holder.func(*input_arguments)
+      return self.supportSets
+    finally:
+      self.supportSets = None
+      dlvhex.cleanupExternalAtomCall()
+
+  def logStatistics(self):
+    pass
+
 class CachedEAtomEvaluator(EAtomEvaluator):
-  def __init__(self, claspcontext):
-    EAtomEvaluator.__init__(self, claspcontext)
-    # cache = defaultdict:
-    # key = eatom name
-    # value = defaultdict
-    #   key = inputtuple
-    #   value = dict:
-    #     key = (predicateinputatoms-true, predicateinputatoms-false)
-    #           [because in partial interpretations there are also unknown atoms]
-    #     value = output
-    self.cache = collections.defaultdict(lambda: collections.defaultdict(dict))
+  '''
+  Evaluator that stores results in a bounded cache.
+
+  The cache key is the eatom name, the input tuple, and the truth values of the predicate inputs
+  packed into an integer (two bits per input in the order of predicateinputatoms).
+  The propagator passes predicate inputs sorted by symbol, so the same predicate input extension
+  yields the same key independent from the solver literals (FLP checker and compatible set finder share the cache).
+  '''
+  # digits for truth values in the packed key
+  PACKDIGIT = { None: '0', True: '1', False: '2' }
+
+  def __init__(self, claspcontext, maxsize, pool=None, asynclimit=10, asynctimeout=None):
+    EAtomEvaluator.__init__(self, claspcontext, pool, asynclimit, asynctimeout)
+    # key = (eatom name, inputtuple, number of predicate inputs, packed truth values of predicate inputs)
+    #       [truth values because in partial interpretations there are also unknown atoms]
+    # value = output
+    self.cache = hexlite.LRUCache(maxsize)
 
   def evaluateNoncached(self, holder, inputtuple, predicateinputatoms):
     return EAtomEvaluator.evaluate(self, holder, inputtuple, predicateinputatoms)
 
+  def packedInputValues(self, predicateinputatoms):
+    if len(predicateinputatoms) == 0:
+      return 0
+    value = self.ccontext.propcontrol.assignment.value
+    digits = self.PACKDIGIT
+    return int(''.join([ digits[value(x.symlit.lit)] for x in predicateinputatoms ]), 4)
+
+  def cacheKey(self, holder, inputtuple, predicateinputatoms):
+    return (holder.name, inputtuple, len(predicateinputatoms), self.packedInputValues(predicateinputatoms))
+
   def evaluateCached(self, holder, inputtuple, predicateinputatoms):
-    # this is handled by defaultdict
-    storage = self.cache[holder.name][inputtuple]
-    positiveinputatoms = frozenset(x for x in predicateinputatoms if x.isTrue())
-    negativeinputatoms = frozenset(x for x in predicateinputatoms if x.isFalse())
-    key = (positiveinputatoms, negativeinputatoms)
-    if key not in storage:
-      storage[key] = EAtomEvaluator.evaluate(
-        self, holder, inputtuple, predicateinputatoms)
-    return storage[key]
+    key = self.cacheKey(holder, inputtuple, predicateinputatoms)
+    result = self.cache.get(key)
+    if result is None:
+      result = EAtomEvaluator.evaluate(self, holder, inputtuple, predicateinputatoms)
+      self.cache.put(key, result)
+    return result
+
+  def evaluateBatch(self, holder, requests):
+    # only evaluate requests that are not in the cache (in one batch)
+    keys = [ self.cacheKey(holder, inputtuple, predicateinputatoms) for inputtuple, predicateinputatoms in requests ]
+    results = [ self.cache.get(key) for key in keys ]
+    missing = [ idx for idx, result in enumerate(results) if result is None ]
+    if len(missing) > 0:
+      computed = EAtomEvaluator.evaluateBatch(self, holder, [ requests[idx] for idx in missing ])
+      for idx, result in zip(missing, computed):
+        results[idx] = result
+        self.cache.put(keys[idx], result)
+    return results
+
+  def evaluateBatches(self, batches):
+    # only evaluate requests that are not in the cache (all batches together)
+    keys = [ [ self.cacheKey(holder, inputtuple, predicateinputatoms) for inputtuple, predicateinputatoms in requests ]
+             for holder, requests in batches ]
+    results = [ [ self.cache.get(key) for key in bkeys ] for bkeys in keys ]
+    missing = [ [ idx for idx, result in enumerate(bresults) if result is None ] for bresults in results ]
+    computed = EAtomEvaluator.evaluateBatches(self, [
+      (holder, [ requests[idx] for idx in bmissing ])
+      for (holder, requests), bmissing in zip(batches, missing) if len(bmissing) > 0 ])
+    computed = iter(computed)
+    for bkeys, bresults, bmissing in zip(keys, results, missing):
+      if len(bmissing) > 0:
+        for idx, result in zip(bmissing, next(computed)):
+          bresults[idx] = result
+          self.cache.put(bkeys[idx], result)
+    return results
 
   def evaluate(self, holder, inputtuple, predicateinputatoms):
     # we cache for total and partial evaluations,
-    # because our architecture would evaluate multiple times for multiple output tuples
-    # of the same nonground external atom on the same (partial) interpretation
+    # because the propagator evaluates each input tuple once per check
+    # and subsequent checks often see the same (partial) interpretation of the predicate inputs
     # -> the cache avoids recomputations in this case
     return self.evaluateCached(holder, inputtuple, predicateinputatoms)
 
+  def logStatistics(self):
+    logging.info('external atom cache: %s', self.cache.statistics())
+
 class GringoContext:
   class ExternalAtomCall:
-    def __init__(self, eaeval, holder):
+    def __init__(self, eaeval, holder, pcache):
       self.eaeval = eaeval
       self.holder = holder
+      self.pcache = pcache
     def __call__(self, *arguments):
-      logging.debug('GC.EAC(%s) called with %s',self.holder.name, repr(arguments))
-      outKnownTrue, outUnknown = self.eaeval.evaluate(self.holder, arguments, [])
-      assert(len(outUnknown) == 0) # no partial evaluation for eatoms in grounding
+      tracing.debug('GC.EAC(%s) called with %r', self.holder.name, arguments)
+      outKnownTrue = None
+      cacheable = self.pcache is not None and self.pcache.isCacheable(self.holder)
+      if cacheable:
+        outKnownTrue = self.pcache.lookup(self.holder, arguments)
+      if outKnownTrue is None:
+        outKnownTrue, outUnknown = self.eaeval.evaluate(self.holder, arguments, [])
+        assert(len(outUnknown) == 0) # no partial evaluation for eatoms in grounding
+        if cacheable:
+          self.pcache.store(self.holder, arguments, outKnownTrue)
       outarity = self.holder.outnum
       gringoOut = None
       # interpret special cases for gringo @eatom rewritings:
@@ -388,14 +667,16 @@ class GringoContext:
       else:
         gringoOut = outKnownTrue
       # in other cases we can directly use what externalAtomCallHelper returned
-      logging.debug('GC.EAC(%s) call returned output %s', self.holder.name, repr(gringoOut))
+      tracing.debug('GC.EAC(%s) call returned output %r', self.holder.name, gringoOut)
       return gringoOut
-  def __init__(self, eaeval):
+  def __init__(self, eaeval, pcache=None):
     assert(isinstance(eaeval, EAtomEvaluator))
     self.eaeval = eaeval
+    # persistent cache (or None)
+    self.pcache = pcache
   def __getattr__(self, attr):
     #logging.debug('GC.%s called',attr)
-    return self.ExternalAtomCall(self.eaeval, dlvhex.eatoms[attr])
+    return self.ExternalAtomCall(self.eaeval, dlvhex.eatoms[attr], self.pcache)
 
 
 class ClingoPropagator:
@@ -414,15 +695,35 @@ class ClingoPropagator:
       # symlit for ground eatom replacement
       self.replacement = replacement
       # key = argument position, value = list of ClingoID
+      # (shared by all verifications with the same predicate inputs)
       self.predinputs = collections.defaultdict(list)
-      # list of all elements in self.predinputs (cache)
-      self.allinputs = []
+      # PredicateInputs with all elements in self.predinputs sorted by symbol (shared like predinputs)
+      self.allinputs = PredicateInputs(())
       # whether this should be verified on partial assignments
       self.verify_on_partial = verify_on_partial
+      # input and output part of the replacement atom arguments (set in init)
+      self.inputtuple = None
+      self.outputtuple = None
+
+  class EAtomVerificationGroup:
+    """
+    all verifications of one external atom with the same input tuple
+    (they share their predicate inputs, so one evaluation of the external atom verifies all of them)
+    """
+    def __init__(self, eatomname, inputtuple, allinputs, verify_on_partial):
+      self.eatomname = eatomname
+      self.inputtuple = inputtuple
+      # PredicateInputs (same as EAtomVerification.allinputs of all verifications in the group)
+      self.allinputs = allinputs
+      self.verify_on_partial = verify_on_partial
+      # list of EAtomVerification
+      self.verifications = []
+      # position in ClingoPropagator.verificationGroups (set in init)
+      self.idx = None
 
   class Nogood:
-    def __init__(self):
-      self.literals = set()
+    def __init__(self, literals=()):
+      self.literals = set(literals)
 
     def add(self, lit):
       if -lit in self.literals:
@@ -433,14 +734,120 @@ class ClingoPropagator:
   class StopPropagation(Exception):
     pass
 
-  def __init__(self, name, pcontext, ccontext, eaeval, partial_evaluation_eatoms):
+  class RestrictedAssignment:
+    '''
+    view of a clingo assignment where only the given solver literals keep their value (all others are unassigned)
+    '''
+    def __init__(self, assignment, keep):
+      self.assignment = assignment
+      self.keep = keep
+    def value(self, lit):
+      if lit in self.keep or -lit in self.keep:
+        return self.assignment.value(lit)
+      return None
+    def is_true(self, lit):
+      return self.value(lit) == True
+    def is_false(self, lit):
+      return self.value(lit) == False
+
+  class PartialCheckScheduler:
+    '''
+    decides whether a ground external atom that provides partial answers is verified in a check on a partial assignment
+    (checks on total assignments always verify all ground external atoms)
+
+    policies:
+    * always: verify in each check on a partial assignment
+    * budget: verify while partial checks of this external atom used less than the time budget (seconds)
+    * inputs: verify if at least a fraction of the inputs, relevance, and replacement literals
+              has a different truth value than in the last partial check of this ground external atom
+    * level: verify only up to a maximum decision level
+    '''
+    def __init__(self, config):
+      self.policy = config.partialcheck
+      self.budget = config.partialcheckbudget
+      self.inputfraction = config.partialcheckinputs
+      self.maxlevel = config.partialchecklevel
+      # key = eatomname, value = seconds spent in partial checks
+      self.spent = collections.defaultdict(float)
+      # key = EAtomVerificationGroup.idx, value = solver literals whose changes count for policy inputs
+      self.groupLiterals = {}
+      # key = (thread_id, EAtomVerificationGroup.idx), value = frozenset of true solver literals at the last partial check
+      self.lastAssignment = {}
+      # statistics
+      self.verified = 0
+      self.skipped = 0
+
+    def reset(self):
+      # verification groups were (re)created
+      self.groupLiterals = {}
+      self.lastAssignment = {}
+
+    def shouldVerify(self, control, group):
+      if self.policy == 'always':
+        ret = True
+      elif self.policy == 'budget':
+        ret = self.spent[group.eatomname] < self.budget
+      elif self.policy == 'level':
+        ret = control.assignment.decision_level <= self.maxlevel
+      else:
+        assert(self.policy == 'inputs')
+        ret = self.inputsChanged(control, group)
+      if ret:
+        self.verified += 1
+      else:
+        self.skipped += 1
+      return ret
+
+    def inputsChanged(self, control, group):
+      lits = self.groupLiterals.get(group.idx, None)
+      if lits is None:
+        lits = set([ x.symlit.lit for x in group.allinputs ])
+        for veri in group.verifications:
+          lits |= set([veri.relevance.lit, veri.replacement.lit])
+        lits = self.groupLiterals[group.idx] = list(lits)
+      assignment = control.assignment
+      current = frozenset([ lit for lit in lits if assignment.is_true(lit) ] +
+                          [ -lit for lit in lits if assignment.is_false(lit) ])
+      key = (control.thread_id, group.idx)
+      last = self.lastAssignment.get(key, None)
+      if last is not None:
+        changed = len(current - last)
+        if changed == 0 or changed < self.inputfraction * len(lits):
+          return False
+      self.lastAssignment[key] = current
+      return True
+
+    def partialCheckDone(self, group, seconds):
+      self.spent[group.eatomname] += seconds
+
+    def logStatistics(self, name):
+      if self.skipped > 0:
+        logging.info('%s partial check policy %s verified %d and skipped %d ground external atoms', name,
+          self.policy, self.verified, self.skipped)
+
+  class RestrictedControl:
+    # stands in for the PropagateControl during evaluations on a RestrictedAssignment
+    def __init__(self, control, keep):
+      self.assignment = ClingoPropagator.RestrictedAssignment(control.assignment, keep)
+
+  def __init__(self, name, pcontext, ccontext, eaeval, partial_evaluation_eatoms, minimization_eatoms=(), config=None, eatomnames=None):
+    if config is None:
+      config = hexlite.Configuration()
     self.name = 'ClingoProp('+name+'):'
     # key = eatom
     # value = list of EAtomVerification
     self.eatomVerifications = collections.defaultdict(list)
-    # mapping from solver literals to lists of strings
+    # list of EAtomVerificationGroup (indexed by EAtomVerificationGroup.idx)
+    self.verificationGroups = []
+    # key = symbol of predicate input atom, value = ClingoID (for storeAtom)
+    self.inputsBySymbol = {}
+    # key = (eatom, replacement atom arguments), value = replacement SymLit (for storeOutputAtom)
+    self.replacements = {}
+    # tracing level (see hexlite.Configuration.trace)
+    self.trace = config.trace
+    # mapping from solver literals to lists of strings (only built for tracing assignments)
     self.dbgSolv2Syms = collections.defaultdict(list)
-    # mapping from symbol to solver literal
+    # mapping from symbol to solver literal (only built for tracing assignments)
     self.dbgSym2Solv = {}
     # program context - to get external atoms and signatures to initialize EAtomVerification instances
     self.pcontext = pcontext
@@ -450,61 +857,138 @@ class ClingoPropagator:
     self.eaeval = eaeval
     # list of names of external atoms that should do checks on partial assignments
     self.partial_evaluation_eatoms = partial_evaluation_eatoms
+    # list of names of external atoms whose nogoods should be minimized by re-evaluation
+    self.minimization_eatoms = minimization_eatoms
+    # names of external atoms verified by this propagator (None = all external atoms in the program)
+    self.eatomnames = eatomnames
+    # maximum number of external atom evaluations for minimizing one nogood
+    self.nogoodmincalls = config.nogoodmincalls
+    # whether nogoods are added immediately or collected and added at the end of check()
+    self.batchnogoods = config.nogoods == 'batch'
+    # whether clasp may delete added nogoods (lock) and whether they are only valid for the current solving step (tag)
+    self.nogoodlock = config.nogoodlock
+    self.nogoodtag = config.nogoodtag
+    # decides which ground external atoms are verified in checks on partial assignments
+    self.scheduler = self.PartialCheckScheduler(config)
+    # key = thread_id, value = list of lists of literals (nogoods collected in batch mode)
+    self.pendingNogoods = collections.defaultdict(list)
+    # key = (thread_id, EAtomVerificationGroup.idx)
+    # value = (solver literals of true inputs, known true output tuples) of the last evaluation
+    #         (only for external atoms that are monotonic in all predicate inputs)
+    self.monotonicResults = {}
+    # statistics
+    self.monotonicSkips = 0
+    self.nogoodsAdded = 0
+    self.nogoodLiterals = 0
+    self.fixedLiteralsOmitted = 0
+    self.minimizationCalls = 0
+    self.minimizationRemoved = 0
+    self.checkCalls = 0
+    self.checkTime = 0.0
 
   def init(self, init):
     name = self.name+'init:'
     # register mapping for solver/grounder atoms!
     # no need for watches as long as we use only check()
     require_partial_evaluation = False
+    self.eatomVerifications = collections.defaultdict(list)
+    self.verificationGroups = []
+    self.inputsBySymbol = {}
+    self.replacements = {}
+    self.monotonicResults = {}
+    # key = (eatomname, inputtuple)
+    # value = EAtomVerificationGroup
+    groups = collections.OrderedDict()
+    # key = predicate name, value = list of arities of the predicate in the ground program
+    arities = collections.defaultdict(list)
+    for aname, aarity, apol in init.symbolic_atoms.signatures:
+      if aarity not in arities[aname]:
+        arities[aname].append(aarity)
+    # key = predicate name, value = list of (arity, list of ClingoID) (built on first use as predicate input)
+    predicateAtoms = {}
+    # key = tuple of (argument position, predicate name)
+    # value = (predinputs, allinputs) shared by all verifications with the same predicate inputs
+    sharedInputs = {}
     for eatomname, signatures in self.pcontext.eatoms.items():
-      logging.info(name+' processing eatom '+eatomname)
+      if self.eatomnames is not None and eatomname not in self.eatomnames:
+        continue
+      tracing.info('%s processing eatom %s', name, eatomname)
       found_this_eatomname = False
       verify_on_partial = eatomname in self.partial_evaluation_eatoms
       for siginfo in signatures:
-        logging.debug(name+' init processing eatom {} relpred {} reppred arity {}'.format(
-          eatomname, siginfo.relevancePred, siginfo.replacementPred, siginfo.arity))
+        tracing.debug('%s init processing eatom %s relpred %s reppred %s arity %d', name,
+          eatomname, siginfo.relevancePred, siginfo.replacementPred, siginfo.arity)
         for xrep in init.symbolic_atoms.by_signature(siginfo.replacementPred, siginfo.arity):
           found_this_eatomname = True
-          logging.debug(name+'   replacement atom {}'.format(str(xrep.symbol)))
+          tracing.debug('%s   replacement atom %s', name, xrep.symbol)
           replacement = SymLit(xrep.symbol, init.solver_literal(xrep.literal))
           xrel = init.symbolic_atoms[clingo.Function(name=siginfo.relevancePred, arguments = xrep.symbol.arguments)]
-          logging.debug(name+'   relevance atom {}'.format(str(xrel.symbol)))
+          tracing.debug('%s   relevance atom %s', name, xrel.symbol)
           relevance = SymLit(xrel.symbol, init.solver_literal(xrel.literal))
 
           verification = self.EAtomVerification(relevance, replacement, verify_on_partial)
+          # in replacement atom everything that is not output is relevant input
+          outnum = dlvhex.eatoms[eatomname].outnum
+          replargs = xrep.symbol.arguments
+          verification.inputtuple = tuple(replargs[0:len(replargs)-outnum])
+          verification.outputtuple = tuple(replargs[len(replargs)-outnum:len(replargs)])
+          self.replacements[(eatomname, tuple(replargs))] = replacement
 
           # get symbols given to predicate inputs and register their literals
-          for argpos, argtype in enumerate(dlvhex.eatoms[eatomname].inspec):
-            if argtype == dlvhex.PREDICATE:
-              argval = str(xrep.symbol.arguments[argpos])
-              logging.debug(name+'     argument {} is {}'.format(argpos, str(argval)))
-              relevantSig = [ (aarity, apol) for (aname, aarity, apol) in init.symbolic_atoms.signatures if aname == argval ]
-              logging.debug(name+'       relevantSig {}'.format(repr(relevantSig)))
-              for aarity, apol in relevantSig:
-                for ax in init.symbolic_atoms.by_signature(argval, aarity):
-                  logging.debug(name+'         atom {}'.format(str(ax.symbol)))
-                  predinputid = ClingoID(self.ccontext, SymLit(ax.symbol, init.solver_literal(ax.literal)))
-                  verification.predinputs[argpos].append(predinputid)
-
-          verification.allinputs = frozenset(hexlite.flatten([idlist for idlist in verification.predinputs.values()]))
+          inputkey = tuple([ (argpos, str(xrep.symbol.arguments[argpos]))
+                             for argpos, argtype in enumerate(dlvhex.eatoms[eatomname].inspec)
+                             if argtype == dlvhex.PREDICATE ])
+          if inputkey not in sharedInputs:
+            for argpos, argval in inputkey:
+              tracing.debug('%s     argument %d is %s', name, argpos, argval)
+              if argval not in predicateAtoms:
+                predicateAtoms[argval] = [ (aarity, self.predicateInputAtoms(init, argval, aarity)) for aarity in arities.get(argval, []) ]
+              for aarity, atoms in predicateAtoms[argval]:
+                verification.predinputs[argpos].extend(atoms)
+            # sorted to get the same order for the same predicate input extension in all propagators
+            sharedInputs[inputkey] = (verification.predinputs,
+              PredicateInputs(sorted(set(hexlite.flatten(verification.predinputs.values())), key=lambda x: x.symlit.sym)))
+          verification.predinputs, verification.allinputs = sharedInputs[inputkey]
           self.eatomVerifications[eatomname].append(verification)
+
+          groupkey = (eatomname, verification.inputtuple)
+          if groupkey not in groups:
+            group = self.EAtomVerificationGroup(eatomname, verification.inputtuple, verification.allinputs, verify_on_partial)
+            group.idx = len(self.verificationGroups)
+            groups[groupkey] = group
+            self.verificationGroups.append(group)
+          groups[groupkey].verifications.append(verification)
       if found_this_eatomname:
         # this eatom is used at least once in the search
         if eatomname in self.partial_evaluation_eatoms:
           logging.info('%s will perform checks on partial assignments due to external atom %s', name, eatomname)
           require_partial_evaluation = True
 
+    # external atoms with complete support sets need no verification in check()
+    supported = self.addSupportSets(init)
+    if len(supported) > 0:
+      self.verificationGroups = [ group for group in self.verificationGroups if group.idx not in supported ]
+      for idx, group in enumerate(self.verificationGroups):
+        group.idx = idx
+      logging.info('%s %d evaluations per check are replaced by complete support sets', name, len(supported))
+    self.scheduler.reset()
+
+    logging.info('%s grouped %d verifications into %d evaluations per check', name,
+      sum([ len(g.verifications) for g in self.verificationGroups ]), len(self.verificationGroups))
+
     if require_partial_evaluation:
       init.check_mode = clingo.PropagatorCheckMode.Fixpoint
     else:
       # this is the default anyways
       init.check_mode = clingo.PropagatorCheckMode.Total
 
-    # for debugging: get full symbol table
-    if __debug__:
+    # for tracing assignments: get full symbol table
+    self.dbgSolv2Syms = collections.defaultdict(list)
+    self.dbgSym2Solv = {}
+    if self.trace >= hexlite.TRACE_ASSIGNMENTS:
       for x in init.symbolic_atoms:
         slit = init.solver_literal(x.literal)
-        logging.debug("PropInit symbol:{} lit:{} isfact:{} slit:{}".format(x.symbol, x.literal, x.is_fact, slit))
+        tracing.debug("PropInit symbol:%s lit:%d isfact:%s slit:%d", x.symbol, x.literal, x.is_fact, slit)
         prefix = 'F'
         if not x.is_fact:
           prefix = str(x.literal)
@@ -513,10 +997,96 @@ class ClingoPropagator:
 
     # WONTFIX (near future) implement this current type of check in on_model where we can comfortably add all nogoods immediately
     # TODO (near future) use partial checks and stay in check()
-    # TODO (far future) create one propagator for each external atom (or even for each external atom literal)
-    #                   which watches predicate inputs, relevance, and replacement, and incrementally finds when it should compute
-    #                   [then we need to find out which grounded input tuple belongs to which atom, so we might need
-    #                    nonground-eatom-literal-unique input tuple auxiliaries (which might hurt efficiency)]
+    # TODO (far future) create one propagator for each external atom literal (--propagators=eatom creates one per external atom name)
+  def predicateInputAtoms(self, init, predicate, arity):
+    '''
+    returns list of ClingoID for all atoms of predicate/arity in the ground program
+    (one ClingoID per symbol in all verifications, see inputsBySymbol)
+    '''
+    ret = []
+    for ax in init.symbolic_atoms.by_signature(predicate, arity):
+      tracing.debug('%s         atom %s', self.name, ax.symbol)
+      predinputid = self.inputsBySymbol.get(ax.symbol, None)
+      if predinputid is None:
+        predinputid = ClingoID(self.ccontext, SymLit(ax.symbol, init.solver_literal(ax.literal)))
+        self.inputsBySymbol[ax.symbol] = predinputid
+      ret.append(predinputid)
+    return ret
+
+  def addSupportSets(self, init):
+    '''
+    asks external atoms with support sets for their support sets (once per ground input tuple)
+    and adds them as clauses to the solver:
+    * each support set (nogood with inputs and one replacement literal) becomes a clause
+      (extended by the relevance atom, because replacement atoms are only guessed if relevant)
+    * complete positive support sets: replacement true implies the input part of some positive support set
+    * complete negative support sets: replacement false (and relevant) implies the input part of some negative support set
+
+    returns set of EAtomVerificationGroup.idx of groups that are fully determined by complete support sets
+    '''
+    name = self.name+'aSS:'
+    supported = set()
+    # evaluate on an empty assignment (plugins should not look at the assignment when learning support sets)
+    self.ccontext.propcontrol = self.RestrictedControl(init, set())
+    self.ccontext.propagator = self
+    try:
+      for group in self.verificationGroups:
+        holder = dlvhex.eatoms[group.eatomname]
+        if not holder.props.support_sets:
+          continue
+        if holder.batch or holder.isasync:
+          logging.warning('%s support sets of batch or async external atom %s are ignored', name, group.eatomname)
+          continue
+        # key = replacement symbol, value = EAtomVerification
+        verifications = dict([ (veri.replacement.sym, veri) for veri in group.verifications ])
+        # key = replacement symbol, value = list of lists of input literals
+        positive = collections.defaultdict(list)
+        negative = collections.defaultdict(list)
+        for ng in self.eaeval.learnSupportSets(holder, group.inputtuple, group.allinputs):
+          replacements = [ clingoid for clingoid in ng if clingoid.symlit.sym in verifications ]
+          if len(replacements) != 1:
+            logging.warning('%s ignoring support set %s of %s without exactly one replacement atom', name, repr(ng), group.eatomname)
+            continue
+          veri = verifications[replacements[0].symlit.sym]
+          body = [ clingoid.symlit.lit for clingoid in ng if clingoid is not replacements[0] ]
+          if replacements[0].symlit.lit == veri.replacement.lit:
+            negative[veri.replacement.sym].append(body)
+          else:
+            positive[veri.replacement.sym].append(body)
+          tracing.debug('%s support set %r', name, ng)
+          init.add_clause([ -lit for lit in body ] + [ -replacements[0].symlit.lit, -veri.relevance.lit ])
+        if holder.props.complete_positive_support_sets:
+          for veri in group.verifications:
+            self.addSupportSetCompletion(init, [ -veri.replacement.lit ], positive[veri.replacement.sym])
+        if holder.props.complete_negative_support_sets:
+          for veri in group.verifications:
+            self.addSupportSetCompletion(init, [ veri.replacement.lit, -veri.relevance.lit ], negative[veri.replacement.sym])
+        if holder.props.complete_positive_support_sets or holder.props.complete_negative_support_sets:
+          supported.add(group.idx)
+    finally:
+      self.ccontext.propcontrol = None
+      self.ccontext.propagator = None
+    return supported
+
+  def addSupportSetCompletion(self, init, condition, bodies):
+    '''
+    adds clauses such that condition (list of literals) implies that one of bodies (lists of literals) is true
+    '''
+    if any([ len(body) == 0 for body in bodies ]):
+      # some body is always true
+      return
+    clause = list(condition)
+    for body in bodies:
+      if len(body) == 1:
+        clause.append(body[0])
+      else:
+        # auxiliary literal that implies all literals in body
+        aux = init.add_literal()
+        for lit in body:
+          init.add_clause([ -aux, lit ])
+        clause.append(aux)
+    init.add_clause(clause)
+
   def check(self, control):
     '''
     * get valueAuxTrue and valueAuxFalse truth values
@@ -525,10 +1095,10 @@ class ClingoPropagator:
     '''
     # called on total assignments (even without watches)
     name = self.name+'check:'
-    logging.info('%s entering with assignment.is_total=%d', self.name, control.assignment.is_total)
+    tracing.info('%s entering with assignment.is_total=%d', self.name, control.assignment.is_total)
     #for t in traceback.format_stack():
     #  logging.info(self.name+'   '+t)
-    if __debug__:
+    if self.trace >= hexlite.TRACE_ASSIGNMENTS:
       true = []
       false = []
       unassigned = []
@@ -541,84 +1111,308 @@ class ClingoPropagator:
         else:
           assert(control.assignment.value(slit) == None)
           unassigned.append(info)
-      if len(true) > 0: logging.debug(name+" assignment has true slits "+' '.join(true))
-      if len(false) > 0: logging.debug(name+" assignment has false slits "+' '.join(false))
-      if len(unassigned) > 0: logging.debug(name+" assignment has unassigned slits "+' '.join(unassigned))
-      logging.info(name+"assignment is "+' '.join([ str(x[0]) for x in self.dbgSym2Solv.items() if control.assignment.is_true(x[1]) ]))
+      if len(true) > 0: tracing.debug("%s assignment has true slits %s", name, ' '.join(true))
+      if len(false) > 0: tracing.debug("%s assignment has false slits %s", name, ' '.join(false))
+      if len(unassigned) > 0: tracing.debug("%s assignment has unassigned slits %s", name, ' '.join(unassigned))
+      tracing.debug("%s assignment is %s", name, ' '.join([ str(x[0]) for x in self.dbgSym2Solv.items() if control.assignment.is_true(x[1]) ]))
+    self.checkCalls += 1
+    starttime = time.perf_counter()
     partial_evaluation = not control.assignment.is_total
     with self.ccontext(control, self):
       try:
-        for eatomname, veriList in self.eatomVerifications.items():
-          for veri in veriList:
-            if partial_evaluation and not veri.verify_on_partial:
-              # just skip this verification here
-              continue
-            if control.assignment.is_true(veri.relevance.lit):
-              self.verifyTruthOfAtom(eatomname, control, veri)
-            else:
-              logging.debug(name+' no need to verify atom {}'.format(veri.replacement.sym))
+        pending = [ group for group in self.verificationsToCheck(control)
+                    if not partial_evaluation or (group.verify_on_partial and self.scheduler.shouldVerify(control, group)) ]
+        # evaluate batch and parallel external atoms for all pending input tuples at once
+        results = self.evaluateGroupsUpFront(control, pending)
+        for group in pending:
+          groupstart = time.perf_counter()
+          try:
+            conclusive = self.verifyGroup(control, group, results.get(group.idx, None))
+          finally:
+            if partial_evaluation:
+              self.scheduler.partialCheckDone(group, time.perf_counter() - groupstart)
+          self.verificationFinished(control, group, conclusive)
+        if self.batchnogoods:
+          self.flushNogoods(control)
       except ClingoPropagator.StopPropagation:
         # this is part of the intended behavior
-        logging.debug(name+' aborted propagation')
+        tracing.debug('%s aborted propagation', name)
         #logging.debug('aborted from '+traceback.format_exc())
-    logging.info(self.name+' leaving')
+    self.checkTime += time.perf_counter() - starttime
+    tracing.info('%s leaving', self.name)
+
+  def verificationsToCheck(self, control):
+    '''
+    returns EAtomVerificationGroup instances for all ground external atoms that check() should look at
+    '''
+    return self.verificationGroups
+
+  def verificationFinished(self, control, group, conclusive):
+    '''
+    called by check() after group was processed without aborting propagation
+    (conclusive is False if some external atom could not be verified on this assignment)
+    '''
+    pass
+
+  def relevantVerifications(self, control, group):
+    return [ veri for veri in group.verifications if control.assignment.is_true(veri.relevance.lit) ]
+
+  def evaluateGroupsUpFront(self, control, groups):
+    '''
+    evaluates all groups with relevant verifications of
+    * batch external atoms (one plugin call per external atom), and
+    * external atoms marked for parallel evaluation (all concurrently in worker processes)
+    returns dict with key = EAtomVerificationGroup.idx and value = (known true tuples, unknown tuples)
+    '''
+    # key = eatomname, value = list of EAtomVerificationGroup
+    batches = collections.OrderedDict()
+    for group in groups:
+      if not self.eaeval.evaluatesUpFront(dlvhex.eatoms[group.eatomname]):
+        continue
+      relevant = self.relevantVerifications(control, group)
+      if len(relevant) > 0 and not self.verifiedByMonotonicity(control, group, relevant):
+        batches.setdefault(group.eatomname, []).append(group)
+    results = {}
+    if len(batches) == 0:
+      return results
+    outputs = self.eaeval.evaluateBatches([
+      (dlvhex.eatoms[eatomname], [ (group.inputtuple, group.allinputs) for group in batchgroups ])
+      for eatomname, batchgroups in batches.items() ])
+    for batchgroups, batchoutputs in zip(batches.values(), outputs):
+      for group, output in zip(batchgroups, batchoutputs):
+        results[group.idx] = output
+    return results
+
+  def verifyGroup(self, control, group, result=None):
+    '''
+    evaluates the external atom of group once (unless result was already evaluated in a batch)
+    and verifies all relevant replacement atoms of the group
+    then adds one nogood for each wrong guess (all in one batch)
+
+    returns False if some replacement atom could not be verified (partial evaluation gave unknown output)
+    '''
+    name = self.name+'vG:'
+    relevant = self.relevantVerifications(control, group)
+    if len(relevant) == 0:
+      tracing.debug('%s no need to verify atoms %s', name, tracing.join(' ', group.verifications, lambda veri: str(veri.replacement.sym)))
+      return True
+    if result is None and self.verifiedByMonotonicity(control, group, relevant):
+      tracing.debug('%s true inputs of monotonic %s only grew since it verified %s', name,
+        group.eatomname, tracing.join(' ', relevant, lambda veri: str(veri.replacement.sym)))
+      self.monotonicSkips += 1
+      return True
+    if self.trace >= hexlite.TRACE_PROPAGATION:
+      idebug = pprint.pformat([ x.value() for x in group.allinputs if x.isTrue() ])
+      tracing.debug('%s checking %s with inputtuple %r and interpretation %s (%s)', name,
+        group.eatomname, group.inputtuple, idebug,
+        {True:'total', False:'partial'}[control.assignment.is_total])
+    if result is None:
+      holder = dlvhex.eatoms[group.eatomname]
+      result = self.eaeval.evaluate(holder, group.inputtuple, group.allinputs)
+    outKnownTrue, outUnknown = frozenset(result[0]), frozenset(result[1])
+    if self.trace >= hexlite.TRACE_PROPAGATION:
+      tracing.debug("%s outTrue %s outUnknown %s", name, tracing.pformat(outKnownTrue), tracing.pformat(outUnknown))
+    if self.isMonotonic(group):
+      self.monotonicResults[(control.thread_id, group.idx)] = (
+        frozenset([ x.symlit.lit for x in group.allinputs if control.assignment.is_true(x.symlit.lit) ]), outKnownTrue)
+
+    conclusive = True
+    # list of (EAtomVerification, realValue)
+    failed = []
+    for veri in relevant:
+      result = self.verifyTruthOfAtom(group.eatomname, control, veri, outKnownTrue, outUnknown)
+      if result is None:
+        conclusive = False
+      elif result != control.assignment.is_true(veri.replacement.lit):
+        failed.append( (veri, result) )
+
+    nogoods = []
+    for realValue in [True, False]:
+      # wrong guesses with the same real value share the input part of their nogoods
+      realFailed = [ (veri, value) for veri, value in failed if value == realValue ]
+      if len(realFailed) == 0:
+        continue
+      keep = self.monotonicInputs(control, group, realValue)
+      if group.eatomname in self.minimization_eatoms:
+        keep = self.minimalInputs(control, group, realFailed, keep)
+      inputpart = self.inputNogoodPart(control, group, keep)
+      if inputpart is not None:
+        nogoods += [ self.nogoodForWrongGuess(inputpart, veri, value) for veri, value in realFailed ]
+    if len(nogoods) > 0:
+      self.addNogoods([ ng for ng in nogoods if ng is not None ])
+    return conclusive
+
+  def isMonotonic(self, group):
+    '''
+    whether the external atom of group is monotonic in all its predicate inputs
+    '''
+    holder = dlvhex.eatoms[group.eatomname]
+    return len(group.allinputs) > 0 and all([ argpos in holder.props.monotonic
+      for argpos, argtype in enumerate(holder.inspec) if argtype == dlvhex.PREDICATE ])
+
+  def verifiedByMonotonicity(self, control, group, relevant):
+    '''
+    whether all relevant verifications of a monotonic external atom are guessed true
+    and were true in the last evaluation with a subset of the current true inputs
+    (then they are still true and the external atom does not need to be evaluated)
+    '''
+    previous = self.monotonicResults.get((control.thread_id, group.idx), None)
+    if previous is None:
+      return False
+    trueInputs, outKnownTrue = previous
+    return (
+      all([ control.assignment.is_true(veri.replacement.lit) and veri.outputtuple in outKnownTrue for veri in relevant ]) and
+      all([ control.assignment.is_true(lit) for lit in trueInputs ]))
+
+  def monotonicInputs(self, control, group, realValue):
+    '''
+    returns the solver literals of inputs of group that must be in a nogood for a wrong guess with realValue
+    given the monotonic and antimonotonic predicate inputs of the external atom
+    (None if the external atom declares neither, then all assigned inputs are required)
+    * realValue True: true inputs at monotonic positions, false inputs at antimonotonic positions
+    * realValue False: false inputs at monotonic positions, true inputs at antimonotonic positions
+    * all assigned inputs at other positions
+    '''
+    props = dlvhex.eatoms[group.eatomname].props
+    if len(props.monotonic) == 0 and len(props.antimonotonic) == 0:
+      return None
+    keep = set()
+    # all verifications of the group have the same predicate inputs
+    for argpos, atoms in group.verifications[0].predinputs.items():
+      if argpos in props.monotonic:
+        required = realValue
+      elif argpos in props.antimonotonic:
+        required = not realValue
+      else:
+        required = None
+      for atom in atoms:
+        value = control.assignment.value(atom.symlit.lit)
+        if value is not None and (required is None or value == required):
+          keep.add(atom.symlit.lit)
+    return keep
+
+  def verifyTruthOfAtom(self, eatomname, control, veri, outKnownTrue, outUnknown):
+    '''
+    compares the guess for veri with the output of the external atom
 
-  def verifyTruthOfAtom(self, eatomname, control, veri):
+    returns the real value of the external atom (True/False) or None if it could not be verified
+    '''
     name = self.name+'vTOA:'
     targetValue = control.assignment.is_true(veri.replacement.lit)
-    if __debug__:
-      idebug = pprint.pformat([ x.value() for x in veri.allinputs if x.isTrue() ])
-      logging.debug(name+' checking if {} = {} with interpretation {} ({})'.format(
-        str(targetValue), veri.replacement.sym, idebug,
-        {True:'total', False:'partial'}[control.assignment.is_total]))
-    holder = dlvhex.eatoms[eatomname]
-    # in replacement atom everything that is not output is relevant input
-    replargs = veri.replacement.sym.arguments
-    inputtuple = tuple(replargs[0:len(replargs)-holder.outnum])
-    outputtuple = tuple(replargs[len(replargs)-holder.outnum:len(replargs)])
-    logging.debug(name+' inputtuple {} outputtuple {}'.format(repr(inputtuple), repr(outputtuple)))
-    outKnownTrue, outUnknown = self.eaeval.evaluate(holder, inputtuple, veri.allinputs)
-    logging.debug(name+" outputtuple {} outTrue {} outUnknown {}".format(pprint.pformat(outputtuple), pprint.pformat(outKnownTrue), pprint.pformat(outUnknown)))
-
-    if outputtuple in outUnknown:
+    tracing.debug('%s checking if %s = %s with outputtuple %r', name,
+      targetValue, veri.replacement.sym, veri.outputtuple)
+
+    if veri.outputtuple in outUnknown:
       # cannot verify
-      logging.info("%s external atom gave tuple %s as unknown -> cannot verify", name, outputtuple)
-      return
+      tracing.info("%s external atom gave tuple %s as unknown -> cannot verify", name, veri.outputtuple)
+      return None
 
-    realValue = outputtuple in outKnownTrue
-    # TODO now handle all outputs in out!
+    realValue = veri.outputtuple in outKnownTrue
     if realValue == targetValue:
-      logging.info("%s atom %s positively verified!", name, eatomname)
+      tracing.info("%s atom %s positively verified!", name, eatomname)
       # TODO somehow adding the (redundant) nogood aborts the propagation
       # this was the case with bb7ab74
       # benjamin said there is a bug, now i try the WIP branch 83038e
-      return
     else:
-      logging.info("%s atom %s verification failed!", name, eatomname)
-    # add clause that ensures this value is always chosen correctly in the future
-    # clause contains veri.relevance.lit, veri.replacement.lit and negation of all atoms in
+      tracing.info("%s atom %s verification failed!", name, eatomname)
+    return realValue
+
+  def minimalInputs(self, control, group, failed, keep=None):
+    '''
+    finds a subset of the assigned predicate inputs of group that is sufficient for the real values in failed
+    (list of (EAtomVerification, realValue)) by re-evaluating the external atom with fewer assigned inputs:
+    chunks of inputs are removed (halving chunks that cannot be removed) until no chunk is left
+    or nogoodmincalls evaluations were made
+
+    this is sound because the external atom provides partial answers:
+    a known value on fewer assigned inputs is the same for all extensions of these inputs
+
+    keep (if not None) is a sufficient set of solver literals of inputs to start with
+
+    returns set of solver literals of inputs to keep in the nogood
+    '''
+    name = self.name+'mI:'
+    if keep is None:
+      keep = set([ atom.symlit.lit for atom in group.allinputs if control.assignment.value(atom.symlit.lit) is not None ])
+    original = len(keep)
+    chunks = [ sorted(keep) ]
+    calls = 0
+    while len(chunks) > 0 and calls < self.nogoodmincalls:
+      chunk = chunks.pop()
+      trial = keep.difference(chunk)
+      calls += 1
+      if self.evaluationAgrees(control, group, failed, trial):
+        keep = trial
+      elif len(chunk) > 1:
+        mid = len(chunk) // 2
+        chunks.append(chunk[mid:])
+        chunks.append(chunk[:mid])
+    self.minimizationCalls += calls
+    self.minimizationRemoved += original - len(keep)
+    tracing.debug('%s kept %d of %d inputs with %d evaluations', name, len(keep), original, calls)
+    return keep
+
+  def evaluationAgrees(self, control, group, failed, keep):
+    '''
+    evaluates the external atom of group as if only inputs with solver literals in keep were assigned
+    returns whether this evaluation gives the real values in failed
+    '''
+    self.ccontext.propcontrol = self.RestrictedControl(control, keep)
+    try:
+      outKnownTrue, outUnknown = self.eaeval.evaluate(dlvhex.eatoms[group.eatomname], group.inputtuple, group.allinputs)
+    finally:
+      self.ccontext.propcontrol = control
+    outKnownTrue, outUnknown = frozenset(outKnownTrue), frozenset(outUnknown)
+    return all([ veri.outputtuple not in outUnknown and (veri.outputtuple in outKnownTrue) == realValue
+                 for veri, realValue in failed ])
 
-    # build nogood: solution is eliminated if ...
+  def inputNogoodPart(self, control, group, keep=None):
+    '''
+    build the part of nogoods for wrong guesses in group that is shared by all of them:
+    solution is eliminated if all inputs (or only those with solver literals in keep) are as they are now ...
+    (inputs fixed on the top level are always as they are now, so they are omitted)
 
+    returns (Nogood, human readable list of (symbol, sign), number of omitted top level inputs)
+    or None if no nogood can be built
+    '''
+    name = self.name+'iNP:'
     # XXX make this more elegant (not carry everything twice in nogood and in hr_nogood)
     nogood = self.Nogood()
     hr_nogood = []
+    fixed = 0
 
     # ... all inputs are as they were above ...
-    for atom in veri.allinputs:
-      # TODO exclude inputs fixed on the top level?
+    for atom in group.allinputs:
+      if keep is not None and atom.symlit.lit not in keep:
+        continue
       value = control.assignment.value(atom.symlit.lit)
+      if value is not None and control.assignment.level(atom.symlit.lit) == 0:
+        fixed += 1
+        continue
       if value == True:
         hr_nogood.append( (atom.symlit.sym,True) )
         if not nogood.add(atom.symlit.lit):
-          logging.debug(name+" cannot build nogood (opposite literals)!")
-          return
+          tracing.debug("%s cannot build nogood (opposite literals)!", name)
+          return None
       elif value == False:
         hr_nogood.append( (atom.symlit.sym,False) )
         if not nogood.add(-atom.symlit.lit):
-          logging.debug(name+" cannot build nogood (opposite literals)!")
-          return
+          tracing.debug("%s cannot build nogood (opposite literals)!", name)
+          return None
       # None case does not contribute to nogood
+    return nogood, hr_nogood, fixed
+
+  def nogoodForWrongGuess(self, inputpart, veri, realValue):
+    '''
+    extends the nogood inputpart from inputNogoodPart by the wrongly guessed replacement atom of veri
+    returns Nogood or None
+    '''
+    name = self.name+'nFWG:'
+    # add clause that ensures this value is always chosen correctly in the future
+    inputnogood, hr_inputnogood, fixed = inputpart
+    self.fixedLiteralsOmitted += fixed
+    nogood = self.Nogood(inputnogood.literals)
+    hr_nogood = list(hr_inputnogood)
 
     checklit = None
     if realValue == True:
@@ -631,27 +1425,126 @@ class ClingoPropagator:
       hr_nogood.append( (veri.replacement.sym,True) )
 
     if not nogood.add(checklit):
-      logging.debug(self.name+"CPvTOA cannot build nogood (opposite literals)!")
-      return
+      tracing.debug("%s cannot build nogood (opposite literals)!", name)
+      return None
 
-    if logging.getLogger().isEnabledFor(logging.INFO):
-      hr_nogood_str = repr([ {True:'',False:'-'}[sign]+str(x) for x, sign in hr_nogood ])
-      logging.info("%s CPcheck adding nogood %s", name, hr_nogood_str)
-    self.addNogood(nogood)
+    tracing.info("%s CPcheck adding nogood %s", name,
+      tracing.lazy(lambda: repr([ {True:'',False:'-'}[sign]+str(x) for x, sign in hr_nogood ])))
+    return nogood
+
+  def addNogoods(self, nogoods):
+    '''
+    adds a batch of nogoods (stops at the first one after which clasp cannot continue propagation)
+    '''
+    for nogood in nogoods:
+      self.addNogood(nogood)
 
   def addNogood(self, nogood):
     name = self.name+'addNogood:'
     nogood = list(nogood.literals)
-    if __debug__:
-      logging.debug(name+" adding {}".format(repr(nogood)))
+    if self.trace >= hexlite.TRACE_PROPAGATION:
+      tracing.debug("%s adding %r", name, nogood)
       for slit in nogood:
         a = abs(slit)
-        logging.debug(name+"  {} ({}) is {}".format(a, self.ccontext.propcontrol.assignment.value(a), repr(self.dbgSolv2Syms[a])))
-    may_continue = self.ccontext.propcontrol.add_nogood(nogood, tag=False, lock=True)
-    logging.debug(name+" may_continue={}".format(repr(may_continue)))
+        tracing.debug("%s  %d (%s) is %r", name, a, self.ccontext.propcontrol.assignment.value(a), self.dbgSolv2Syms.get(a, []))
+    self.nogoodsAdded += 1
+    self.nogoodLiterals += len(nogood)
+    if self.batchnogoods:
+      self.pendingNogoods[self.ccontext.propcontrol.thread_id].append(nogood)
+      return
+    may_continue = self.ccontext.propcontrol.add_nogood(nogood, tag=self.nogoodtag, lock=self.nogoodlock)
+    tracing.debug("%s may_continue=%r", name, may_continue)
     if may_continue == False:
       raise ClingoPropagator.StopPropagation()
 
+  def flushNogoods(self, control):
+    '''
+    adds all nogoods collected in batch mode and propagates them once
+    (stops at the first one after which clasp cannot continue propagation)
+    '''
+    name = self.name+'flushNogoods:'
+    nogoods = self.pendingNogoods.pop(control.thread_id, [])
+    if len(nogoods) == 0:
+      return
+    tracing.debug('%s adding %d nogoods', name, len(nogoods))
+    for nogood in nogoods:
+      if not control.add_nogood(nogood, tag=self.nogoodtag, lock=self.nogoodlock):
+        raise ClingoPropagator.StopPropagation()
+    if not control.propagate():
+      raise ClingoPropagator.StopPropagation()
+
+  def logStatistics(self):
+    if self.checkCalls > 0:
+      logging.info('%s spent %.3f seconds in %d checks', self.name, self.checkTime, self.checkCalls)
+    self.scheduler.logStatistics(self.name)
+    if self.nogoodsAdded > 0:
+      logging.info('%s added %d nogoods with average size %.2f (omitted %.2f inputs fixed on the top level per nogood)', self.name,
+        self.nogoodsAdded, float(self.nogoodLiterals) / self.nogoodsAdded, float(self.fixedLiteralsOmitted) / self.nogoodsAdded)
+    if self.monotonicSkips > 0:
+      logging.info('%s skipped %d evaluations of monotonic external atoms', self.name, self.monotonicSkips)
+    if self.minimizationCalls > 0:
+      logging.info('%s nogood minimization removed %d input literals with %d evaluations', self.name,
+        self.minimizationRemoved, self.minimizationCalls)
+
+class WatchingClingoPropagator(ClingoPropagator):
+  '''
+  Propagator that registers watches on relevance, replacement, and predicate input literals
+  and verifies in check() only those ground external atoms where a watched literal changed
+  (was assigned or unassigned) since the last check on the same solver thread.
+  '''
+  def __init__(self, name, pcontext, ccontext, eaeval, partial_evaluation_eatoms, minimization_eatoms=(), config=None, eatomnames=None):
+    ClingoPropagator.__init__(self, name, pcontext, ccontext, eaeval, partial_evaluation_eatoms, minimization_eatoms, config, eatomnames)
+    # key = solver literal (both signs are watched)
+    # value = list of EAtomVerificationGroup.idx
+    self.lit2groups = collections.defaultdict(list)
+    # key = thread id
+    # value = set of EAtomVerificationGroup.idx that need to be verified in the next check()
+    self.dirty = {}
+
+  def init(self, init):
+    ClingoPropagator.init(self, init)
+    name = self.name+'init:'
+    self.lit2groups = collections.defaultdict(list)
+    self.dirty = {}
+    for group in self.verificationGroups:
+      lits = set([ x.symlit.lit for x in group.allinputs ])
+      for veri in group.verifications:
+        lits |= set([veri.relevance.lit, veri.replacement.lit])
+      for lit in lits:
+        self.lit2groups[lit].append(group.idx)
+        self.lit2groups[-lit].append(group.idx)
+    for lit in self.lit2groups.keys():
+      init.add_watch(lit)
+    logging.info('%s watching %d literals for %d verification groups', name, len(self.lit2groups), len(self.verificationGroups))
+
+  def dirtyGroups(self, thread_id):
+    # initially everything must be verified
+    if thread_id not in self.dirty:
+      self.dirty[thread_id] = set(range(0, len(self.verificationGroups)))
+    return self.dirty[thread_id]
+
+  def markDirty(self, thread_id, changes):
+    dirty = self.dirtyGroups(thread_id)
+    for lit in changes:
+      dirty.update(self.lit2groups[lit])
+
+  def propagate(self, control, changes):
+    self.markDirty(control.thread_id, changes)
+
+  def undo(self, thread_id, assignment, changes):
+    # unassigned literals are changes as well (the next check might see a different partial assignment)
+    self.markDirty(thread_id, changes)
+
+  def verificationsToCheck(self, control):
+    dirty = self.dirtyGroups(control.thread_id)
+    tracing.debug('%s check: %d of %d verification groups are dirty', self.name, len(dirty), len(self.verificationGroups))
+    # iterate over a sorted copy because verificationFinished modifies the set
+    return [ self.verificationGroups[idx] for idx in sorted(dirty) ]
+
+  def verificationFinished(self, control, group, conclusive):
+    if conclusive:
+      self.dirtyGroups(control.thread_id).discard(group.idx)
+
 class ModelReceiver:
   def __init__(self, facts, config, flpchecker):
     self.facts = set(self._normalizeFacts(facts))
@@ -675,7 +1568,7 @@ class ModelReceiver:
     if len(costs) > 0:
       # first entry = highest priority level
       # last entry = lowest priority level (1)
-      logging.debug('on_model got cost'+repr(costs))
+      tracing.debug('on_model got cost %r', costs)
       pairs = [ '[{}:{}]'.format(p[1], p[0]+1) for p in enumerate(reversed(costs)) if p[1] != 0 ]
       costs=' <{}>'.format(','.join(pairs))
     else:
@@ -707,18 +1600,49 @@ def execute(pcontext, rewritten, facts, plugins, config):
   ccontext = ClaspContext()
 
   # preparing evaluator for external atoms which needs to know the clasp context
-  #eaeval = EAtomEvaluator(ccontext)
-  eaeval = CachedEAtomEvaluator(ccontext)
+  # preparing worker processes if some external atom should be evaluated in parallel
+  pool = None
+  if config.eatomworkers > 0 and any([ holder.props.parallel for holder in dlvhex.eatoms.values() ]):
+    pool = workerpool.WorkerPool(config.eatomworkers, [ p.mname for p in plugins ])
+
+  if config.eatomcache > 0:
+    eaeval = CachedEAtomEvaluator(ccontext, config.eatomcache, pool, config.eatomconcurrency, config.eatomtimeout)
+  else:
+    eaeval = EAtomEvaluator(ccontext, pool, config.eatomconcurrency, config.eatomtimeout)
 
   # find names of external atoms that advertises to do checks on a partial assignment
   partial_evaluation_eatoms = [ eatomname for eatomname, info in dlvhex.eatoms.items() if info.props.provides_partial ]
   # XXX we could filter here to reduce this set or we could decide to do no partial evaluation at all or we could do this differently for FLP checker and Compatible Set finder
   should_do_partial_evaluation_on = partial_evaluation_eatoms
 
-  propagatorFactory = lambda name: ClingoPropagator(name, pcontext, ccontext, eaeval, should_do_partial_evaluation_on)
+  # find names of external atoms that request minimized nogoods
+  # (minimization re-evaluates on fewer assigned inputs, so this is only sound for atoms that provide partial answers)
+  minimization_eatoms = []
+  if config.nogoodmincalls > 0:
+    for eatomname, info in dlvhex.eatoms.items():
+      if info.props.minimize_nogoods:
+        if info.props.provides_partial:
+          minimization_eatoms.append(eatomname)
+        else:
+          logging.warning('cannot minimize nogoods of external atom %s because it does not provide partial answers', eatomname)
+
+  if config.propagation == 'watch':
+    propagator_class = WatchingClingoPropagator
+  else:
+    assert(config.propagation == 'sweep')
+    propagator_class = ClingoPropagator
+  propagatorFactory = lambda name, eatomnames=None: propagator_class(name, pcontext, ccontext, eaeval, should_do_partial_evaluation_on,
+                                                                     minimization_eatoms, config, eatomnames)
 
-  if config.flpcheck == 'explicit':
+  if config.flpcheck != 'none' and pcontext.eatomCycles is not None and len(pcontext.eatomCycles) == 0:
+    logging.info('no external atom depends on its own output: compatible sets are answer sets, FLP check is not necessary')
+    flp_checker_factory = flp.DummyFLPChecker
+  elif config.flpcheck == 'explicit':
     flp_checker_factory = flp.ExplicitFLPChecker
+  elif config.flpcheck == 'ufs':
+    if pcontext.eatomCycles is not None:
+      logging.info('UFS check is restricted to %d components with cycles through external atoms', len(pcontext.eatomCycles))
+    flp_checker_factory = lambda factory: flp.UnfoundedSetFLPChecker(factory, pcontext.cyclicPredicates())
   else:
     assert(config.flpcheck == 'none')
     flp_checker_factory = flp.DummyFLPChecker
@@ -744,19 +1668,40 @@ def execute(pcontext, rewritten, facts, plugins, config):
   # preparing context for instantiation
   # (this class is specific to the gringo API)
   logging.info('grounding with gringo context')
-  ccc = GringoContext(eaeval)
+  pcache = None
+  if config.eatomcachedir is not None:
+    pcache = persistentcache.PersistentEAtomCache(config.eatomcachedir)
+  ccc = GringoContext(eaeval, pcache)
   flpchecker.attach(cc)
-  cc.ground([('base',())], ccc)
+  try:
+    cc.ground([('base',())], ccc)
+  finally:
+    if pcache is not None:
+      pcache.close()
 
   logging.info('preparing for search')
 
   # name of this propagator CSF = compatible set finder
-  checkprop = propagatorFactory('CSF')
-  cc.register_propagator(checkprop)
+  if config.propagators == 'eatom':
+    # one propagator per external atom: each has its own check mode and watches and its own statistics
+    checkprops = [ propagatorFactory('CSF/'+eatomname, [eatomname]) for eatomname in pcontext.eatoms.keys() ]
+  else:
+    assert(config.propagators == 'single')
+    checkprops = [ propagatorFactory('CSF') ]
+  for checkprop in checkprops:
+    cc.register_propagator(checkprop)
   mr = ModelReceiver(facts, config, flpchecker)
 
   logging.info('starting search')
-  cc.solve(on_model=mr)
+  try:
+    cc.solve(on_model=mr)
+  finally:
+    if pool is not None:
+      pool.close()
+
+  eaeval.logStatistics()
+  for checkprop in checkprops:
+    checkprop.logStatistics()
 
   # TODO return code for unsat/sat/opt?
   return 0
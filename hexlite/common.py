@@ -21,15 +21,24 @@ import collections
 import logging
 import argparse
 
+# tracing levels of the propagator (Configuration.trace)
+TRACE_NONE = 0
+# external atom evaluations and added nogoods
+TRACE_PROPAGATION = 1
+# additionally the full assignment in each check (requires symbol tables of all atoms)
+TRACE_ASSIGNMENTS = 2
+
 class Configuration:
   def __init__(self):
     # whether to produce verbose output
     self.verbose = False
     # whether to produce debug output
     self.debug = False
+    # how much the propagator traces (TRACE_NONE, TRACE_PROPAGATION, or TRACE_ASSIGNMENTS)
+    self.trace = TRACE_NONE
     # maxint setting (for compatibility with dlvhex, actually not necessary here)
     self.maxint = 0
-    # which type of FLP check to use, or 'none'
+    # which type of FLP check to use ('explicit' or 'ufs'), or 'none'
     self.flpcheck = 'explicit'
     # number of answer sets to enumerate (0 = all)
     self.number = 0
@@ -37,6 +46,36 @@ class Configuration:
     self.nofacts = False
     # whether to give auxiliary facts in output
     self.auxfacts = False
+    # how the propagator finds external atoms to verify ('sweep' or 'watch')
+    self.propagation = 'sweep'
+    # whether one propagator verifies all external atoms or each external atom name gets its own propagator ('single' or 'eatom')
+    self.propagators = 'single'
+    # which ground external atoms are verified in checks on partial assignments ('always', 'budget', 'inputs', or 'level')
+    self.partialcheck = 'always'
+    # seconds that partial checks of one external atom may take in total (policy 'budget')
+    self.partialcheckbudget = 1.0
+    # minimum fraction of literals of a ground external atom that changed since its last partial check (policy 'inputs')
+    self.partialcheckinputs = 0.25
+    # maximum decision level for partial checks (policy 'level')
+    self.partialchecklevel = 10
+    # maximum number of cached external atom evaluation results (0 = no cache)
+    self.eatomcache = 100000
+    # directory for persistent cache of deterministic external atoms evaluated in grounding (None = no persistent cache)
+    self.eatomcachedir = None
+    # number of worker processes for external atoms marked for parallel evaluation (0 = evaluate in solver process)
+    self.eatomworkers = 0
+    # maximum number of concurrently running async external atoms
+    self.eatomconcurrency = 10
+    # maximum seconds for one call of an async external atom (None = no limit)
+    self.eatomtimeout = None
+    # maximum number of re-evaluations for minimizing one nogood of atoms that request minimized nogoods (0 = no minimization)
+    self.nogoodmincalls = 16
+    # whether the propagator adds nogoods immediately or collects them and adds them at the end of a check ('immediate' or 'batch')
+    self.nogoods = 'immediate'
+    # whether added nogoods are protected from deletion by clasp
+    self.nogoodlock = True
+    # whether added nogoods are only valid for the current solving step
+    self.nogoodtag = False
 
   def add_common_arguments(self, parser):
     assert(isinstance(parser, argparse.ArgumentParser))
@@ -44,8 +83,9 @@ class Configuration:
       help='Whether liberal safety is requested (ignored).')
     parser.add_argument('--strongnegation-enable', action='store_true', default=False,
       help='Whether strong negation is enabled (ignored).')
-    parser.add_argument('--flpcheck', choices=['explicit', 'none'], action='store', default='explicit',
-      help='Which type of FLP check to use (explicit FLP check currently does not work for strong negation and optimization).')
+    parser.add_argument('--flpcheck', choices=['explicit', 'ufs', 'none'], action='store', default='explicit',
+      help='Which type of FLP check to use (explicit FLP check currently does not work for strong negation and optimization, '
+           'ufs searches for unfounded sets only among atoms on cycles through external atoms).')
     parser.add_argument('-n', '--number', metavar='N', action='store', default=0,
       help='Number of models to enumerate.')
     parser.add_argument('-N', '--maxint', metavar='N', action='store', default=None,
@@ -54,14 +94,46 @@ class Configuration:
       help='Whether to output given facts in answer set.')
     parser.add_argument('--auxfacts', action='store_true', default=False,
       help='Whether to output auxiliary facts in answer set.')
+    parser.add_argument('--propagation', choices=['sweep', 'watch'], action='store', default='sweep',
+      help='How the propagator finds external atoms to verify: all in each check (sweep) or only those whose relevance, replacement, or predicate inputs changed since the last check (watch).')
+    parser.add_argument('--propagators', choices=['single', 'eatom'], action='store', default='single',
+      help='Whether one propagator verifies all external atoms (single) or each external atom gets its own propagator with its own check mode, watches, and statistics (eatom).')
+    parser.add_argument('--partialcheck', choices=['always', 'budget', 'inputs', 'level'], action='store', default='always',
+      help='Which external atoms that provide partial answers are verified on partial assignments: all (always), those whose partial checks did not yet exceed --partialcheckbudget (budget), those where at least --partialcheckinputs of the inputs changed since their last partial check (inputs), or all up to decision level --partialchecklevel (level).')
+    parser.add_argument('--partialcheckbudget', metavar='SECONDS', action='store', default=1.0,
+      help='Time that partial checks of one external atom may take in total (for --partialcheck=budget).')
+    parser.add_argument('--partialcheckinputs', metavar='FRACTION', action='store', default=0.25,
+      help='Minimum fraction of inputs of a ground external atom that must have changed since its last partial check (for --partialcheck=inputs).')
+    parser.add_argument('--partialchecklevel', metavar='N', action='store', default=10,
+      help='Maximum decision level for partial checks (for --partialcheck=level).')
+    parser.add_argument('--eatomcache', metavar='N', action='store', default=100000,
+      help='Maximum number of cached external atom evaluation results (least recently used results are evicted, 0 = no cache).')
+    parser.add_argument('--eatomcachedir', metavar='DIR', action='store', default=None,
+      help='Directory for a persistent cache of results of deterministic external atoms evaluated during grounding.')
+    parser.add_argument('--eatomworkers', metavar='N', action='store', default=0,
+      help='Number of worker processes that concurrently evaluate external atoms marked for parallel evaluation (0 = no worker processes).')
+    parser.add_argument('--eatomconcurrency', metavar='N', action='store', default=10,
+      help='Maximum number of concurrently running calls of external atoms defined with async def.')
+    parser.add_argument('--eatomtimeout', metavar='SECONDS', action='store', default=None,
+      help='Maximum time for one call of an external atom defined with async def (default: no limit).')
+    parser.add_argument('--nogoodmincalls', metavar='N', action='store', default=16,
+      help='Maximum number of external atom re-evaluations for minimizing one learned nogood (only for external atoms that request minimized nogoods, 0 = no minimization).')
+    parser.add_argument('--nogoods', choices=['immediate', 'batch'], action='store', default='immediate',
+      help='Whether the propagator adds each nogood immediately (and stops at the first conflict) or collects all nogoods of a check and adds them together before propagating once (batch).')
+    parser.add_argument('--nogoodlock', choices=['yes', 'no'], action='store', default='yes',
+      help='Whether nogoods learned from external atoms are protected from deletion by clasp.')
+    parser.add_argument('--nogoodtag', choices=['yes', 'no'], action='store', default='no',
+      help='Whether nogoods learned from external atoms are only valid for the current solving step.')
     parser.add_argument('--verbose', action='store_true', default=False, help='Activate verbose mode.')
     parser.add_argument('--debug', action='store_true', default=False, help='Activate debugging mode.')
+    parser.add_argument('--trace', metavar='LEVEL', action='store', default=TRACE_NONE,
+      help='Trace the propagator in the debug output (implies --debug): 0 = no tracing, 1 = evaluations and nogoods, 2 = additionally the full assignment in each check (slow).')
 
   def setupLogging(self):
     level = logging.WARNING
     if self.verbose:
       level = logging.INFO
-    if self.debug:
+    if self.debug or self.trace > TRACE_NONE:
       level = logging.DEBUG
     # call only once
     logging.getLogger().setLevel(level)
@@ -69,6 +141,12 @@ class Configuration:
   def process_arguments(self, args):
     self.verbose = args.verbose
     self.debug = args.debug
+    try:
+      self.trace = int(args.trace)
+      if self.trace < TRACE_NONE or self.trace > TRACE_ASSIGNMENTS:
+        raise ValueError()
+    except:
+      raise ValueError("faulty trace argument '{}'".format(args.trace))
     self.setupLogging()
     if args.liberalsafety:
       logging.warning("ignored argument about liberal safety")
@@ -79,7 +157,7 @@ class Configuration:
         self.maxint = int(args.maxint)
     except:
       raise ValueError("faulty maxint argument '{}'".format(args.maxint))
-    if self.flpcheck not in ['explicit', 'none']:
+    if self.flpcheck not in ['explicit', 'ufs', 'none']:
       raise ValueError("invalid flpcheck setting '{}'".format(self.flpcheck))
     self.flpcheck = args.flpcheck
     try:
@@ -89,6 +167,62 @@ class Configuration:
       raise ValueError("faulty number argument '{}'".format(args.number))
     self.nofacts = args.nofacts
     self.auxfacts = args.auxfacts
+    self.propagation = args.propagation
+    self.propagators = args.propagators
+    self.partialcheck = args.partialcheck
+    try:
+      self.partialcheckbudget = float(args.partialcheckbudget)
+      if self.partialcheckbudget < 0:
+        raise ValueError()
+    except:
+      raise ValueError("faulty partialcheckbudget argument '{}'".format(args.partialcheckbudget))
+    try:
+      self.partialcheckinputs = float(args.partialcheckinputs)
+      if self.partialcheckinputs < 0 or self.partialcheckinputs > 1:
+        raise ValueError()
+    except:
+      raise ValueError("faulty partialcheckinputs argument '{}'".format(args.partialcheckinputs))
+    try:
+      self.partialchecklevel = int(args.partialchecklevel)
+      if self.partialchecklevel < 0:
+        raise ValueError()
+    except:
+      raise ValueError("faulty partialchecklevel argument '{}'".format(args.partialchecklevel))
+    try:
+      self.eatomcache = int(args.eatomcache)
+      if self.eatomcache < 0:
+        raise ValueError()
+    except:
+      raise ValueError("faulty eatomcache argument '{}'".format(args.eatomcache))
+    self.eatomcachedir = args.eatomcachedir
+    try:
+      self.eatomworkers = int(args.eatomworkers)
+      if self.eatomworkers < 0:
+        raise ValueError()
+    except:
+      raise ValueError("faulty eatomworkers argument '{}'".format(args.eatomworkers))
+    try:
+      self.eatomconcurrency = int(args.eatomconcurrency)
+      if self.eatomconcurrency < 1:
+        raise ValueError()
+    except:
+      raise ValueError("faulty eatomconcurrency argument '{}'".format(args.eatomconcurrency))
+    try:
+      if args.eatomtimeout:
+        self.eatomtimeout = float(args.eatomtimeout)
+        if self.eatomtimeout <= 0:
+          raise ValueError()
+    except:
+      raise ValueError("faulty eatomtimeout argument '{}'".format(args.eatomtimeout))
+    try:
+      self.nogoodmincalls = int(args.nogoodmincalls)
+      if self.nogoodmincalls < 0:
+        raise ValueError()
+    except:
+      raise ValueError("faulty nogoodmincalls argument '{}'".format(args.nogoodmincalls))
+    self.nogoods = args.nogoods
+    self.nogoodlock = args.nogoodlock == 'yes'
+    self.nogoodtag = args.nogoodtag == 'yes'
 
 class Plugin:
   def __init__(self, mname, pmodule):
@@ -99,17 +233,39 @@ class Plugin:
 class ProgramContext:
   '''
   program-global context
-  collects external atom signatures
+  collects external atom signatures and predicate inputs
   remembers if maxint is given by program or by commandline
+  holds the result of the dependency analysis of the rewritten program
   '''
   def __init__(self):
     # key = eatomname, value = list of SignatureInfo
     self.eatoms = collections.defaultdict(list)
+    # key = replacementPred, value = set of predicate names given as predicate inputs (None = unknown predicate)
+    self.eatomInputs = collections.defaultdict(set)
     self.wroteMaxint = False
+    # None if the dependency analysis was not possible, otherwise list of sets of predicate names
+    # (one set for each strongly connected component of the predicate dependency graph with a cycle through an external atom)
+    self.eatomCycles = None
   def addSignature(self, eatomname, relevancePred, replacementPred, arity):
+    # each occurrence of an external atom adds its signature, but the propagator must see each signature only once
+    # (it creates verifications for all replacement atoms of a signature)
+    for siginfo in self.eatoms[eatomname]:
+      if (siginfo.relevancePred, siginfo.replacementPred, siginfo.arity) == (relevancePred, replacementPred, arity):
+        return
     self.eatoms[eatomname].append(
       self.SignatureInfo(relevancePred, replacementPred, arity))
 
+  def addPredicateInputs(self, replacementPred, predicates):
+    self.eatomInputs[replacementPred].update(predicates)
+
+  def cyclicPredicates(self):
+    '''
+    returns the set of predicate names on cycles through external atoms (None if unknown)
+    '''
+    if self.eatomCycles is None:
+      return None
+    return set([ pred for component in self.eatomCycles for pred in component ])
+
   class SignatureInfo:
     def __init__(self, relevancePred, replacementPred, arity):
       self.relevancePred = relevancePred
@@ -117,5 +273,93 @@ class ProgramContext:
       self.arity = arity
 
 
+class LRUCache:
+  '''
+  dictionary with at most maxsize entries
+  evicts the least recently used entry when it grows beyond maxsize
+  counts hits, misses, and evictions
+  '''
+  def __init__(self, maxsize):
+    assert(maxsize > 0)
+    self.maxsize = maxsize
+    self.storage = collections.OrderedDict()
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+
+  def get(self, key):
+    '''
+    returns stored value or None
+    '''
+    value = self.storage.get(key, None)
+    if value is None:
+      self.misses += 1
+    else:
+      self.hits += 1
+      self.storage.move_to_end(key)
+    return value
+
+  def put(self, key, value):
+    assert(value is not None)
+    self.storage[key] = value
+    self.storage.move_to_end(key)
+    while len(self.storage) > self.maxsize:
+      self.storage.popitem(last=False)
+      self.evictions += 1
+
+  def __len__(self):
+    return len(self.storage)
+
+  def statistics(self):
+    return "{} entries, {} hits, {} misses, {} evictions".format(
+      len(self.storage), self.hits, self.misses, self.evictions)
+
+
 def flatten(listoflists):
   return [x for y in listoflists for x in y]
+
+def stronglyConnectedComponents(nodes, successors):
+  '''
+  returns the strongly connected components of a directed graph as a list of lists of nodes
+  (Tarjan's algorithm without recursion, components are returned in reverse topological order)
+  successors is a dictionary from node to an iterable of nodes, nodes without entry have no successors
+  '''
+  index = {}
+  lowlink = {}
+  stack = []
+  onstack = set()
+  components = []
+  for root in nodes:
+    if root in index:
+      continue
+    index[root] = lowlink[root] = len(index)
+    stack.append(root)
+    onstack.add(root)
+    work = [ (root, iter(successors.get(root, ()))) ]
+    while len(work) > 0:
+      node, children = work[-1]
+      for child in children:
+        if child not in index:
+          index[child] = lowlink[child] = len(index)
+          stack.append(child)
+          onstack.add(child)
+          work.append( (child, iter(successors.get(child, ()))) )
+          break
+        elif child in onstack:
+          lowlink[node] = min(lowlink[node], index[child])
+      else:
+        # all children of node are done
+        work.pop()
+        if len(work) > 0:
+          parent = work[-1][0]
+          lowlink[parent] = min(lowlink[parent], lowlink[node])
+        if lowlink[node] == index[node]:
+          component = []
+          while True:
+            x = stack.pop()
+            onstack.discard(x)
+            component.append(x)
+            if x == node:
+              break
+          components.append(component)
+  return components
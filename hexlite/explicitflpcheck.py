@@ -19,11 +19,16 @@
 
 import logging
 import sys
+import collections
+
+import dlvhex
 
 # assume that the main program has handled possible import problems
 import clingo
 
+from . import common as hexlite
 from .aux import Aux
+from . import tracing
 
 # head begin/separator/end sign for key=choice=True (choice rule) or False (disjunction)
 HBEG = { True: '{', False: '' }
@@ -35,34 +40,12 @@ if sys.version_info > (3,):
   # python3 has no long, everything is long
   long = int
 
-def formatAssumptions(assumptions):
-  return "{} not({})".format(
-    repr([a for (a,t) in assumptions if t == True]),
-    repr([a for (a,t) in assumptions if t == False]))
-
-def prefixAtom(atom, prefix):
-  # prefix without breaking strong negation
-  assert(isinstance(atom, str))
-  if atom[0] == '-':
-    return '-'+prefix+atom[1:]
-  else:
-    return prefix+atom
-
-def prefixIfNonempty(s, prefix):
-  if len(s) == 0:
-    return s
-  else:
-    return prefix+s
-
-def ruleHeadAux(idx):
-  return Aux.RHPRED+'('+str(idx)+')'
-
 class GroundProgramObserver:
   class WarnMissing:
     def __init__(self, name):
       self.name = name
     def __call__(self, *arguments):
-      logging.debug("GPOWarning {} {}".format(self.name, repr(arguments)))
+      tracing.debug("GPOWarning %s %r", self.name, arguments)
 
   def __init__(self):
     # a program is a set of rules, we assume gringo/clasp are clever enough to eliminate duplicates
@@ -104,13 +87,13 @@ class GroundProgramObserver:
     self.preliminaryweightrules = []
 
   def init_program(self, incr):
-    logging.debug("GPInit")
+    tracing.debug("GPInit")
     pass
   def begin_step(self):
-    logging.debug("GPBeginStep")
+    tracing.debug("GPBeginStep")
     self.waitingForStuff = True
   def end_step(self):
-    logging.debug("GPEndStep")
+    tracing.debug("GPEndStep")
     # auxatoms
     self.extractAuxAtoms()
     # atoms
@@ -126,21 +109,21 @@ class GroundProgramObserver:
     self.djrules_base = len(self.replrules)+len(self.chrules)
     # done!
     self.waitingForStuff = False
-    if __debug__:
+    if tracing.debugEnabled():
       self.printall()
   def __getattr__(self, name):
     return self.WarnMissing(name)
   def rule(self, choice, head, body):
-    logging.debug("GPRule ch=%s hd=%s b=%s", repr(choice), repr(head), repr(body))
+    tracing.debug("GPRule ch=%r hd=%r b=%r", choice, head, body)
     # it seems we cannot ignore "deterministic" rules
     # sometimes they are necessary, and they concern atoms that have no symbol
     # (for an example, see tests/choicerule4.hex)
     self.preliminaryrules.append( (choice, head, body) )
   def weight_rule(self, choice, head, lower_bound, body):
-    logging.debug("GPWeightRule ch=%s hd=%s lb=%s, b=%s", repr(choice), repr(head), repr(lower_bound), repr(body))
+    tracing.debug("GPWeightRule ch=%r hd=%r lb=%r, b=%r", choice, head, lower_bound, body)
     self.preliminaryweightrules.append( (choice, head, lower_bound, body) )
   def output_atom(self, symbol, atom):
-    logging.debug("GPAtom symb=%s atm=%s", repr(symbol), repr(atom))
+    tracing.debug("GPAtom symb=%r atm=%r", symbol, atom)
     if atom == long(0):
       # this is not a literal but a signal that symbol is always true (i.e., a fact)
       self.facts.append(symbol)
@@ -276,89 +259,99 @@ class GroundProgramObserver:
     # true if at least one program was fully received
     return not self.waitingForStuff
 
-class RuleActivityProgram:
+class RuleActivityEvaluator:
   '''
-  This program is a transformed version of the ground program Pi with HEX replacement atoms.
-
-  It contains:
-  (I) a guess for each atom in Pi:
-    { a }.  for $a \in atoms$
-  (II) for each (non-fact) rule in Pi a rule with a unique head RHPRED(ruleidx) and the body of the original rule.
-    RHPRED(i) :- BODY.  for all r_i \in (replrules \cup chrules \cup djrules)
-
-  The purpose of this program is to find out which rule bodies are satisfied
-  (i.e., which rules are in the FLP reduct) in a given answer set.
+  This evaluator finds out which rule bodies of the ground program Pi with HEX replacement atoms
+  are satisfied (i.e., which rules are in the FLP reduct) in a given compatible set.
 
-  This is determined using solver assumptions which fully determine the guesses (I).
+  The bodies of the rules (by default all rules in Pi) are evaluated directly on the truth values of the model:
+  * a normal body is satisfied if all positive atoms are true and all negative atoms are false,
+  * a weight body is satisfied if the weights of the true literals sum up to at least the lower bound
+    (literals are not collapsed, see formatWeightBody).
   '''
-  def __init__(self, programObserver):
+  def __init__(self, programObserver, rules=None):
+    assert(programObserver.finished())
     self.po = programObserver
-    self.cc = clingo.Control()
-    prog = self._build()
-    with self.cc.builder() as b:
-      for rule in prog:
-        logging.debug('RAP rule: '+repr(rule))
-        # TODO ask Benjamin/benchmark if it is faster to parse one by one or all in one string
-        clingo.parse_program(rule, lambda ast: b.add(ast))
-    logging.debug("RAP grounding starts")
-    self.cc.ground([("base", [])])
-    logging.debug("RAP grounding finished")
-
-  def _assumptionFromModel(self, mdl):
-    syms = mdl.symbols(atoms=True, terms=True)
-    ret = [ (atm, mdl.contains(atm)) for atm in self.po.atom2int.keys() ]
-    ret += [ (clingo.Function(self.po.formatAtom(auxatm)), mdl.is_true(auxatm))
-             for auxatm in self.po.auxatoms ]
-    return ret
-
-  def _build(self):
-    def headActivityRule(idx, rule):
-      activityatom = ruleHeadAux(idx)
+    if rules is None:
+      rules = self.po.allrules
+    # normal rule bodies: list of (rule index, list of positive atoms, list of negative atoms)
+    self.normalBodies = []
+    # weight rule bodies: list of (rule index, lower bound, list of (atom, positive, weight))
+    self.weightBodies = []
+    for idx, rule in enumerate(rules):
       # normal rule (0,choice,head,body)
       # weight rule (1,choice,head,lowerbound,body)
       if rule[0] == 0:
         body = rule[3]
-        if len(body) == 0:
-          return activityatom + '.'
-        else:
-          return activityatom + ':-' + self.po.formatNormalBody(body) + '.'
+        self.normalBodies.append( (idx, [ lit for lit in body if lit > 0 ], [ -lit for lit in body if lit < 0 ]) )
       else:
-        lb = rule[3]
-        body = rule[4]
-        assert(len(body) > 0)
-        return activityatom + ':-' + self.po.formatWeightBody(lb, body) + '.'
-
-    def atomGuessRule(iatm):
-      return  '{'+self.po.formatAtom(iatm)+'}.'
-      
-    assert(self.po.finished())
+        assert(rule[0] == 1)
+        self.weightBodies.append( (idx, rule[3], [ (abs(lit), lit > 0, weight) for lit, weight in rule[4] ]) )
 
-    # (I) guess for each atom
-    raguesses = [ atomGuessRule(atm) for atm in self.po.atoms ]
-    # (II) rules with special auxiliary heads
-    rarules = [ headActivityRule(idx, rule) for idx, rule in enumerate(self.po.allrules) ]
-    # we are interested in which rule is active
-    rashow = ['#show {}/1.'.format(Aux.RHPRED)]
-    return rarules + raguesses + rashow
+  def truthValues(self, mdl):
+    '''
+    returns dictionary from atoms (int) of Pi to their truth value in mdl
+    '''
+    return dict([ (iatm, mdl.is_true(iatm)) for iatm in self.po.atoms ])
 
-  def getActiveRulesForModel(self, mdl):
-    class OnModel:
-      def __init__(self):
-        self.activeRules = None
-      def __call__(self, activeRulesMdl):
-        #logging.debug('activeRulesMdl = '+str(activeRulesMdl)) 
-        shownTrueAtoms = activeRulesMdl.symbols(shown=True)
-        self.activeRules = [ atm.arguments[0].number for atm in shownTrueAtoms ]
-        assert(all([isinstance(r, (int, long)) for r in self.activeRules]))
-
-    assumptions = self._assumptionFromModel(mdl)
-    if __debug__:
-      logging.debug("solving RAP with assumptions "+formatAssumptions(assumptions))
-    modelcb = OnModel()
-    res = self.cc.solve(on_model=modelcb, assumptions=assumptions)
-    assert(res.satisfiable)
-    assert(modelcb.activeRules is not None)
-    return modelcb.activeRules
+  def getActiveRulesForModel(self, mdl, truth=None):
+    '''
+    returns the set of indices of rules with satisfied body in mdl
+    (truth can be given if the caller already has the result of truthValues(mdl))
+    '''
+    if truth is None:
+      truth = self.truthValues(mdl)
+    active = set()
+    for idx, positive, negative in self.normalBodies:
+      if all(truth[iatm] for iatm in positive) and not any(truth[iatm] for iatm in negative):
+        active.add(idx)
+    for idx, lowerbound, body in self.weightBodies:
+      if sum([ weight for iatm, positive, weight in body if truth[iatm] == positive ]) >= lowerbound:
+        active.add(idx)
+    return active
+
+class BackendAtoms:
+  '''
+  Maps atoms of the ground program Pi (int) to atoms of a program that is built with the clingo backend.
+
+  Atoms of Pi with a symbol get the same symbol (so that the propagator finds replacement atoms and predicate inputs),
+  clasp auxiliaries get a new atom without symbol.
+  '''
+  def __init__(self, programObserver, backend):
+    self.po = programObserver
+    self.backend = backend
+    # atom in Pi (int) to atom in the program (int)
+    self.atoms = {}
+
+  def atom(self, iatm):
+    ret = self.atoms.get(iatm, None)
+    if ret is None:
+      if iatm in self.po.int2atom:
+        ret = self.backend.add_atom(self.po.int2atom[iatm])
+      else:
+        ret = self.backend.add_atom()
+      self.atoms[iatm] = ret
+    return ret
+
+  def literal(self, ilit):
+    if ilit > 0:
+      return self.atom(ilit)
+    else:
+      return -self.atom(-ilit)
+
+  def body(self, rule):
+    '''
+    returns the body of rule of Pi as list of literals in the program
+    (a weight body becomes a new atom that is defined by a weight rule)
+    '''
+    # normal rule (0,choice,head,body)
+    # weight rule (1,choice,head,lowerbound,body)
+    if rule[0] == 0:
+      return [ self.literal(lit) for lit in rule[3] ]
+    else:
+      weightbody = self.backend.add_atom()
+      self.backend.add_weight_rule([weightbody], rule[3], [ (self.literal(lit), weight) for lit, weight in rule[4] ])
+      return [ weightbody ]
 
 class CheckOptimizedProgram:
   '''
@@ -392,27 +385,30 @@ class CheckOptimizedProgram:
 
   Then the check program contains:
   (I) A guess for activity of each rule $r_i \in rules$:
-    { AUX_RH(i) }.
+    { RH(i) }.
     (These truths will be fully determined by a solver assumption to fix the FLP reduct.)
   (II) A guess of the compatible set that is investigated:
     for all atoms $x \in cmatoms$ (including choice auxiliaries) we have
-    { AUX_CS(x) }.
+    { CS(x) }.
     (These truths will be fully determined by a solver assumption to fix the compatible set.)
-  (III) A guess { x } :- AUX_CS(x). for each atom $x \in cmatoms$ to guess countermodel atoms wrt a compatible set.
+  (III) A guess { x } :- CS(x). for each atom $x \in cmatoms$ to guess countermodel atoms wrt a compatible set.
   (IV) A constraint that ensures that the countermodel is not greater than the compatible set:
-    :- x, not AUX_CS(x).  for each atom $x \in cmatoms$
+    :- x, not CS(x).  for each atom $x \in cmatoms$
   (V) A rule that detects if the model is smaller than the compatible set:
-    AUX_SMALLER :- not x, AUX_CS(x).  for each $x \in cmatoms$
+    SMALLER :- not x, CS(x).  for each $x \in cmatoms$
   (VI) A constraint that requires to find a smaller answer set:
-    :- not AUX_SMALLER.
+    :- not SMALLER.
   (VII) All facts from the original ground program (only needed for external atom evaluation):
     x.   for all $x \in facts$
   (VIII) For each rule $r_i \in djrules/replrules/chrules$:
-    HEAD :- AUX_RH(i), BODY.
+    HEAD :- RH(i), BODY.
   (IX) For each choice rule $r_i = { ch_1 ; ... ; ch_n } :- BODY$ with $r_i \in chrules$:
-    ch_i | AUX_CH(ch_i).  for all i \in 1,...,n
+    ch_i | CH(ch_i).  for all i \in 1,...,n
     [Without condition, for a choice head atom there is a disjunctive guess].
 
+  The program is built as ground program with the clingo backend (see BackendAtoms):
+  atoms of Pi keep their symbols, RH(i), CS(x), CH(x), and SMALLER are atoms without symbol.
+
   The purpose of this program is to check if the FLP reduct has a model that is smaller than the original compatible set.
 
   This is determined using solver assumptions which
@@ -430,118 +426,79 @@ class CheckOptimizedProgram:
     self.eatomPropagator = propagatorFactory('FLP')
     # build program
     self.cc = clingo.Control()
-    # dictionary from self.po.chatoms (int) to the respective choice auxiliaries (str)
-    self.chauxatoms = {}
-    # list of str of all cmatoms that are relevant for the compatible set
-    self.cmatoms = []
-    prog = self._build()
-    with self.cc.builder() as b:
-      for rule in prog:
-        logging.debug('COP rule: '+repr(rule))
-        # TODO ask Benjamin/benchmark if it is faster to parse one by one or all in one string
-        clingo.parse_program(rule, lambda ast: b.add(ast))
-    logging.debug("COP grounding starts")
-    self.cc.ground([("base", [])])
-    logging.debug("COP grounding finished")
+    # atom in Pi (int) to atom in this program (int)
+    self.atoms = {}
+    # aligned lists for assumptions: RH(i) for all rules in self.po.allrules
+    self.rhLiterals = []
+    # aligned lists for assumptions: atoms x in Pi that are not replatoms and CS(x)
+    self.csAtoms = []
+    self.csLiterals = []
+    # aligned lists for assumptions: chatoms x in Pi and CS(CH(x))
+    self.chAtoms = []
+    self.chLiterals = []
+    tracing.debug("COP construction starts")
+    self._build()
+    tracing.debug("COP construction finished")
     # register propagator for upcoming solve calls
     self.cc.register_propagator(self.eatomPropagator)
 
   def _build(self):
     assert(self.po.finished())
-
-    # create dictionary from self.po.chatoms (int) to the respective choice auxiliaries (str)
-    self.chauxatoms = dict([
-      (ichatom, prefixAtom(self.po.formatAtom(ichatom), Aux.CHATOM))
-      for ichatom in self.po.chatoms ])
-    if __debug__:
-      logging.debug('chauxatoms '+repr(self.chauxatoms))
-
-    # compute cmatoms (strings of all atoms relevant for compatible set)
-    self.cmatoms = [ self.po.formatAtom(iatom)
-                     for iatom in self.po.atoms
-                     if iatom not in self.po.replatoms ]
-    self.cmatoms += self.chauxatoms.values()
-    if __debug__:
-      logging.debug('cmatoms '+repr(self.cmatoms))
-
-    # (I)
-    rhguess = [ '{'+ruleHeadAux(idx)+'}.' for idx in range(0, len(self.po.allrules)) ]
-    # (II)
-    csguess = [ '{'+prefixAtom(a, Aux.CSATOM)+'}.' for a in self.cmatoms ]
-    # (III)
-    atomguess = [ '{'+a+'}:-'+prefixAtom(a, Aux.CSATOM)+'.' for a in self.cmatoms ]
-    # (IV)
-    ensureng = [ ':-'+a+',not '+prefixAtom(a, Aux.CSATOM)+'.' for a in self.cmatoms ]
-    # (V)
-    defsmaller = [ Aux.SMALLER+':-not '+a+','+prefixAtom(a, Aux.CSATOM)+'.' for a in self.cmatoms ]
-    # (VI)
-    needsmaller = [ ':-not '+Aux.SMALLER+'.' ]
-    # (VII)
-    sfacts = [ str(f)+'.' for f in self.po.facts ]
-    # (VIII)
-    def formatAnyRuleInjectAux(rule, idx):
-      # normal rule (0,choice,head,body)
-      # weight rule (1,choice,head,lowerbound,body)
-      choice, head = rule[1], rule[2]
-      # automagic body formatting
-      return self.po.formatHead(choice, head)+':-'+ruleHeadAux(idx)+prefixIfNonempty(self.po.formatBody(rule),',')+'.'
-    allrules = [ formatAnyRuleInjectAux(rule, idx) for idx, rule
-                in enumerate(self.po.allrules) ]
-    # normal rule (0,choice,head,body)
-    # weight rule (1,choice,head,lowerbound,body)
-    chrules = [ self.po.formatAtom(iatm)+'|'+self.chauxatoms[iatm]+'.'
-                for rule in self.po.chrules
-                for iatm in rule[2] ]
-
-    # transform cmatoms into clingo terms of the compatible set auxiliaries
-    # (we no longer need them in their original form)
-    # (we will need them in this way for the assumptions)
-    #self.cmatoms = [ clingo.parse_term(a) for a in self.cmatoms ]
-
-    return rhguess + csguess + atomguess + ensureng + defsmaller + needsmaller + sfacts + allrules + chrules
+    po = self.po
+    with self.cc.backend() as b:
+      mapping = BackendAtoms(po, b)
+      smaller = b.add_atom()
+      def counterModelAtom(x):
+        # (II) (III) (IV) (V) for x \in cmatoms, returns CS(x)
+        cs = b.add_atom()
+        b.add_rule([cs], [], True)
+        b.add_rule([x], [cs], True)
+        b.add_rule([], [x, -cs])
+        b.add_rule([smaller], [-x, cs])
+        return cs
+
+      # (I)
+      for idx in range(0, len(po.allrules)):
+        rh = b.add_atom()
+        b.add_rule([rh], [], True)
+        self.rhLiterals.append(rh)
+      # (II) (III) (IV) (V)
+      for iatm in po.atoms:
+        if iatm not in po.replatoms:
+          self.csAtoms.append(iatm)
+          self.csLiterals.append(counterModelAtom(mapping.atom(iatm)))
+      chaux = {}
+      for ichatom in po.chatoms:
+        chaux[ichatom] = b.add_atom()
+        self.chAtoms.append(ichatom)
+        self.chLiterals.append(counterModelAtom(chaux[ichatom]))
+      # (VI)
+      b.add_rule([], [-smaller])
+      # (VII)
+      for f in po.facts:
+        b.add_rule([b.add_atom(f)])
+      # (VIII)
+      for idx, rule in enumerate(po.allrules):
+        # normal rule (0,choice,head,body)
+        # weight rule (1,choice,head,lowerbound,body)
+        choice, head = rule[1], rule[2]
+        b.add_rule([ mapping.atom(h) for h in head ], [ self.rhLiterals[idx] ] + mapping.body(rule), choice)
+      # (IX)
+      for ichatom, ch in chaux.items():
+        b.add_rule([mapping.atom(ichatom), ch])
+    self.atoms = mapping.atoms
 
   def _assumptionFromActiveRules(self, activeRules):
     # activeRules is a set of integers (indices into self.po.allrules)
     # for each rule we either put positive or negative assumption to fully determine the FLP reduct
-    # TODO this can be optimized over multiple checks by caching the sequence and only changing the booleans
-    return [
-      (clingo.Function(Aux.RHPRED, [clingo.Number(ruleidx)]), ruleidx in activeRules)
-      for ruleidx in range(0, len(self.po.allrules)) ]
+    return [ lit if ruleidx in activeRules else -lit for ruleidx, lit in enumerate(self.rhLiterals) ]
 
   def _assumptionFromModel(self, mdl):
     # mdl contains the answer set candidate
     # we here create assumptions for compatible set auxiliaries
-    ret = []
-
-    #
-    # for all atoms in Pi that are not replatoms we create an assumption
-    #
-
-    # symbolic atoms that are not replatoms
-    for iatm, atm in self.po.int2atom.items():
-      if iatm in self.po.replatoms:
-        continue
-      # TODO cache csAtom <-> iatm
-      csAtom = clingo.parse_term(prefixAtom(str(atm), Aux.CSATOM))
-      # TODO maybe use is_true here too (iatm) TODO benchmark this
-      ret.append( (csAtom, mdl.contains(atm)) )
-
-    # clasp auxiliaries (that are implicitly never replatoms)
-    for iauxatm in self.po.auxatoms:
-      # TODO cache csAtom <-> iauxatm
-      csAtom = clingo.Function(name=prefixAtom(self.po.formatAtom(iauxatm), Aux.CSATOM))
-      ret.append( (csAtom, mdl.is_true(iauxatm)) )
-
-    #
-    # additionally, for choice auxiliaries of chatoms in Pi we create assumptions
-    # these assumptions are the negation of the positive chatom value
-    #
-
-    # choice auxiliaries of chatoms
-    for ichatom, chauxatom in self.chauxatoms.items():
-      # TODO cache csAtom <-> iauxatm
-      csAtom = clingo.parse_term(prefixAtom(chauxatom, Aux.CSATOM))
-      ret.append( (csAtom, not mdl.is_true(ichatom)) )
+    ret = [ lit if mdl.is_true(iatm) else -lit for iatm, lit in zip(self.csAtoms, self.csLiterals) ]
+    # choice auxiliaries are true iff the chatom is false
+    ret += [ -lit if mdl.is_true(ichatom) else lit for ichatom, lit in zip(self.chAtoms, self.chLiterals) ]
     return ret
 
   def checkFLPViolation(self, activeRules, cmdl, explain, explainID):
@@ -552,38 +509,259 @@ class CheckOptimizedProgram:
     * for debugging id explainID
     '''
     class OnModel:
-      def __init__(self, cmdl, po, explain, explainID):
+      def __init__(self, cmdl, po, atoms, explain, explainID):
         self.cmdl = cmdl
         self.po = po
+        self.atoms = atoms
         self.explain = explain
         self.explainID = explainID
       def __call__(self, mdl):
-        logging.debug('flpModel = '+str(mdl)) 
+        tracing.debug('flpModel = %s', mdl)
         if self.explain:
           logging.info('FLP Check (#{}) yielded countermodel:'.format(self.explainID)) 
           # this model is an answer set from the auxiliary FLP model checking program
-          # (IDs are completely independent from those in self.__programObserver)
-          # (symbols are partially the same with several auxiliaries with special meaning)
+          # (IDs are mapped by self.atoms from those in self.__programObserver)
           po = self.po
           logging.info("  Program Atoms that are not true in the counterexample but true in candidate:"+repr(sorted([
             str(sym) for lit, sym in po.int2atom.items()
-            if lit not in po.replatoms and not mdl.contains(sym) and cmdl.contains(sym)])))
+            if lit not in po.replatoms and not mdl.is_true(self.atoms[lit]) and self.cmdl.is_true(lit)])))
           logging.info("  True Replacement Atoms (all):"+repr(sorted([
             str(sym) for lit, sym in po.int2atom.items()
-            if lit in po.replatoms and mdl.contains(sym)])))
-          auxSyms = [clingo.Function(name=self.po.formatAtom(lit)) for lit in po.auxatoms]
+            if lit in po.replatoms and mdl.is_true(self.atoms[lit])])))
           logging.info("  True Auxiliary Atoms (those also in main program):"+repr(sorted([
-            str(aux) for aux in auxSyms if mdl.contains(aux)])))
+            po.formatAtom(lit) for lit in po.auxatoms if mdl.is_true(self.atoms[lit])])))
 
     assumptions = self._assumptionFromActiveRules(activeRules) + self._assumptionFromModel(cmdl)
-    modelcb = OnModel(cmdl, self.po, explain, explainID)
-    if __debug__:
-      logging.debug("solving COP with assumptions "+formatAssumptions(assumptions))
+    modelcb = OnModel(cmdl, self.po, self.atoms, explain, explainID)
+    tracing.debug("solving COP with assumptions %r", assumptions)
     res = self.cc.solve(on_model=modelcb, assumptions=assumptions)
-    logging.debug("res=%s", res)
+    tracing.debug("res=%s", res)
     # if it is unsatisfiable, it has passed the test, i.e., it is an answer set
     return res.unsatisfiable
 
+def replacementInputAtoms(po):
+  '''
+  returns dictionary from replacement atoms (int) to the atoms (int) of their predicate inputs
+  (as the propagator finds them: all positive atoms with the predicate name of the input)
+  '''
+  predicateAtoms = collections.defaultdict(list)
+  for iatm, sym in po.int2atom.items():
+    if iatm not in po.replatoms and sym.type == clingo.SymbolType.Function and sym.positive:
+      predicateAtoms[sym.name].append(iatm)
+  ret = {}
+  for irepl in po.replatoms:
+    sym = po.int2atom[irepl]
+    # replacement predicate is EAREPL_<arity>_<eatomname>
+    eatomname = sym.name[len(Aux.EAREPL)+1:].split('_', 1)[1]
+    inspec = dlvhex.eatoms[eatomname].inspec
+    ret[irepl] = [ iatm
+      for argpos, argtype in enumerate(inspec) if argtype == dlvhex.PREDICATE
+      for iatm in predicateAtoms.get(str(sym.arguments[argpos]), []) ]
+  return ret
+
+def externalCycleAtoms(po, replinputs, predicates=None):
+  '''
+  returns the set of atoms (int) in strongly connected components of the atom dependency graph
+  that contain a replacement atom, i.e., atoms on a cycle through an external atom
+
+  the graph has an edge from each rule head to each positive body atom and to each replacement atom in the body,
+  and an edge from each replacement atom to each of its predicate input atoms
+
+  if predicates is given (see ProgramContext.cyclicPredicates) the graph only contains rules
+  with heads of these predicates (and clasp auxiliaries)
+  '''
+  def relevant(iatm):
+    return predicates is None or iatm not in po.int2atom or po.int2atom[iatm].name in predicates
+  successors = collections.defaultdict(set)
+  for rule in po.chrules + po.djrules:
+    if not any([ relevant(ihead) for ihead in rule[2] ]):
+      continue
+    # normal rule (0,choice,head,body)
+    # weight rule (1,choice,head,lowerbound,body)
+    if rule[0] == 0:
+      body = rule[3]
+    else:
+      body = [ lit for lit, weight in rule[4] ]
+    dependencies = [ abs(lit) for lit in body if lit > 0 or -lit in po.replatoms ]
+    for ihead in rule[2]:
+      successors[ihead].update(dependencies)
+  for irepl, inputs in replinputs.items():
+    if relevant(irepl):
+      successors[irepl].update(inputs)
+  ret = set()
+  for component in hexlite.stronglyConnectedComponents(list(successors.keys()), successors):
+    if len(component) > 1 and any([ x in po.replatoms for x in component ]):
+      ret.update([ x for x in component if x not in po.replatoms ])
+  return ret
+
+class UnfoundedSetCheckProgram:
+  '''
+  This program searches for an unfounded set of the ground program Pi with HEX replacement atoms
+  wrt. a compatible set A, following Section 4 of the paper cited in CheckOptimizedProgram.
+
+  A is an answer set iff no set U of atoms with U \\cap A \\neq \\emptyset is unfounded, i.e.,
+  there is no U such that for each a \\in U and each rule r with a \\in H(r) one of the following holds:
+    (i) A \\not\\models B(r),
+    (ii) A \\oplus \\neg.U \\not\\models B(r) (external atoms are evaluated wrt. A \\oplus \\neg.U), or
+    (iii) A \\models h for some h \\in H(r) \\setminus U.
+
+  An unfounded set that intersects A can be found within the atoms $cyclic$ that are on a cycle
+  through an external atom (see externalCycleAtoms), all other unfounded sets are found by clasp in the main search.
+
+  An atom x of Pi is true in this program iff x \\in A \\oplus \\neg.U. The program contains:
+  (I) A guess { x }. for each atom x \\notin cyclic that occurs in the program.
+    (These truths will be fully determined by a solver assumption to the truth in A.)
+  (II) For each atom x \\in cyclic a guess { INA(x) }. and a guess { x } :- INA(x).
+    (INA(x) will be fully determined by a solver assumption to the truth of x in A, x is false iff x \\in U.)
+  (III) SMALLER :- INA(x), not x.  for each atom x \\in cyclic, and the constraint :- not SMALLER.
+  (IV) A guess { ACT(r) }. for each rule r with H(r) \\cap cyclic \\neq \\emptyset.
+    (These truths will be fully determined by a solver assumption to A \\models B(r).)
+  (V) For each such disjunctive rule r:
+    SOME(r) :- INA(h), not h.  for h \\in H(r) \\cap cyclic
+    :- ACT(r), SOME(r), not h_1, ..., not h_n, B(r).  for H(r) = { h_1, ..., h_n }
+  (VI) For each such choice rule r:
+    :- ACT(r), INA(h), not h, B(r).  for h \\in H(r) \\cap cyclic
+  (VII) All facts of Pi, a guess { e }. for each replacement atom e in these rules and the facts
+    EARELV(...) for its relevance atom, so that the propagator verifies each guess wrt. A \\oplus \\neg.U.
+    (Replacement atoms without predicate input in cyclic are fixed to their truth in A.)
+
+  The program is built once as ground program (via the clingo backend), checks only vary assumptions.
+  '''
+  def __init__(self, programObserver, cyclicAtoms, replinputs, propagatorFactory):
+    self.po = programObserver
+    self.cyclic = cyclicAtoms
+    # name of this propagator = unfounded set checker
+    self.eatomPropagator = propagatorFactory('UFS')
+    self.cc = clingo.Control()
+    # atom in Pi (int) to atom in this program (int)
+    self.atoms = {}
+    # pairs of atom in Pi (int) and atom in this program (int) that are fixed to the truth in A
+    self.fixed = []
+    # pairs of atom in Pi (int) and INA(x) (int) in this program for atoms x in cyclic
+    self.candidates = []
+    # ACT(r) (int) in this program for the rules in self.rules
+    self.activities = []
+    # rules of Pi with an atom in cyclic in the head
+    self.rules = [ rule for rule in self.po.chrules + self.po.djrules
+                   if any([ h in self.cyclic for h in rule[2] ]) ]
+    self._build(replinputs)
+    self.ruleActivity = RuleActivityEvaluator(self.po, self.rules)
+    # register propagator for upcoming solve calls
+    self.cc.register_propagator(self.eatomPropagator)
+
+  def _build(self, replinputs):
+    po = self.po
+    rules = self.rules
+    # atoms of Pi in this program
+    replacements = set()
+    ordinary = set(self.cyclic)
+    for rule in rules:
+      ordinary.update(rule[2])
+      if rule[0] == 0:
+        body = rule[3]
+      else:
+        body = [ lit for lit, weight in rule[4] ]
+      for lit in body:
+        if abs(lit) in po.replatoms:
+          replacements.add(abs(lit))
+        else:
+          ordinary.add(abs(lit))
+    for irepl in replacements:
+      ordinary.update(replinputs[irepl])
+    tracing.debug('UFS check program for %d rules, %d atoms, %d replacement atoms',
+      len(rules), len(ordinary), len(replacements))
+
+    with self.cc.backend() as b:
+      mapping = BackendAtoms(po, b)
+      atom = mapping.atom
+
+      # (I) (II) (III)
+      ina = {}
+      smaller = b.add_atom()
+      for iatm in ordinary:
+        if iatm in self.cyclic:
+          ina[iatm] = b.add_atom()
+          b.add_rule([ina[iatm]], [], True)
+          b.add_rule([atom(iatm)], [ina[iatm]], True)
+          b.add_rule([smaller], [ina[iatm], -atom(iatm)])
+          self.candidates.append( (iatm, ina[iatm]) )
+        else:
+          b.add_rule([atom(iatm)], [], True)
+          self.fixed.append( (iatm, atom(iatm)) )
+      b.add_rule([], [-smaller])
+
+      # (IV) (V) (VI)
+      for rule in rules:
+        act = b.add_atom()
+        b.add_rule([act], [], True)
+        self.activities.append(act)
+        # normal rule (0,choice,head,body)
+        # weight rule (1,choice,head,lowerbound,body)
+        choice, head = rule[1], rule[2]
+        body = [ act ] + mapping.body(rule)
+        if choice:
+          for h in head:
+            if h in self.cyclic:
+              b.add_rule([], body + [ ina[h], -atom(h) ])
+        else:
+          some = b.add_atom()
+          for h in head:
+            if h in self.cyclic:
+              b.add_rule([some], [ ina[h], -atom(h) ])
+          b.add_rule([], body + [ some ] + [ -atom(h) for h in head ])
+
+      # (VII)
+      for f in po.facts:
+        b.add_rule([b.add_atom(f)])
+      for irepl in replacements:
+        b.add_rule([atom(irepl)], [], True)
+        if not any([ x in self.cyclic for x in replinputs[irepl] ]):
+          self.fixed.append( (irepl, atom(irepl)) )
+        sym = po.int2atom[irepl]
+        relevance = clingo.Function(Aux.EARELV+sym.name[len(Aux.EAREPL):], sym.arguments)
+        b.add_rule([b.add_atom(relevance)])
+    self.atoms = mapping.atoms
+
+  def checkUnfoundedSet(self, cmdl, explain, explainID):
+    '''
+    returns True if no unfounded set intersects the compatible set cmdl (= cmdl is an answer set)
+    '''
+    truth = self.ruleActivity.truthValues(cmdl)
+    if not any([ truth[iatm] for iatm, _ in self.candidates ]):
+      tracing.debug('no cyclic atom is true in the compatible set')
+      return True
+
+    class OnModel:
+      def __init__(self, candidates, atoms, po, explain, explainID):
+        self.candidates = candidates
+        self.atoms = atoms
+        self.po = po
+        self.explain = explain
+        self.explainID = explainID
+      def __call__(self, mdl):
+        tracing.debug('ufsModel = %s', mdl)
+        if self.explain:
+          logging.info('UFS Check (#{}) yielded unfounded set:'.format(self.explainID))
+          logging.info("  "+repr(sorted([
+            self.po.formatAtom(iatm) for iatm, ina in self.candidates
+            if mdl.is_true(ina) and not mdl.is_true(self.atoms[iatm]) ])))
+
+    def assume(lit, value):
+      if value:
+        return lit
+      else:
+        return -lit
+    activeRules = self.ruleActivity.getActiveRulesForModel(cmdl, truth)
+    assumptions = [ assume(ina, truth[iatm]) for iatm, ina in self.candidates ]
+    assumptions += [ assume(lit, truth[iatm]) for iatm, lit in self.fixed ]
+    assumptions += [ assume(act, idx in activeRules) for idx, act in enumerate(self.activities) ]
+    modelcb = OnModel(self.candidates, self.atoms, self.po, explain, explainID)
+    tracing.debug("solving UFS check with %d assumptions", len(assumptions))
+    res = self.cc.solve(on_model=modelcb, assumptions=assumptions)
+    tracing.debug("res=%s", res)
+    # if it is unsatisfiable, there is no unfounded set, i.e., it is an answer set
+    return res.unsatisfiable
+
 class FLPCheckerBase:
   def __init__(self, propagatorFactory):
     pass
@@ -604,13 +782,13 @@ class ExplicitFLPChecker(FLPCheckerBase):
     self.__propfactory = propagatorFactory
     # we cannot initialize this in an eager way,
     # because we cannot force clingo to finish instantiation without running solve()
-    self.__ruleActivityProgram = None
+    self.__ruleActivity = None
     # we cannot initialize this in an eager way,
     # because we cannot force clingo to finish instantiation without running solve()
     self.__checkProgram = None
     self.__programObserver = None
-    # whether to explain FLP checking in logging
-    self.explain = True
+    # whether to explain FLP checking in logging (only if the explanation is shown)
+    self.explain = tracing.infoEnabled()
     # running number for explanations
     self.explainID = 1
 
@@ -635,11 +813,10 @@ class ExplicitFLPChecker(FLPCheckerBase):
         if lit in po.replatoms and mdl.is_true(lit)])))
       logging.info("  Auxiliary Atoms:"+repr(sorted([
         str(lit) for lit in po.auxatoms if mdl.is_true(lit)])))
-    ruleActivityProgram = self.ruleActivityProgram()
-    activeRules = ruleActivityProgram.getActiveRulesForModel(mdl)
+    activeRules = self.ruleActivity().getActiveRulesForModel(mdl)
     if self.explain:
       logging.info("FLP Reduct (#{}):".format(self.explainID))
-      for ridx in activeRules:
+      for ridx in sorted(activeRules):
         r = self.__programObserver.allrules[ridx]
         logging.info("  "+repr(self.__programObserver.formatRule(r)))
     checkProgram = self.checkProgram()
@@ -651,12 +828,12 @@ class ExplicitFLPChecker(FLPCheckerBase):
       self.explainID += 1
     return is_answer_set
 
-  def ruleActivityProgram(self):
-    # on first call, creates control object and fills with program
-    # otherwise reuses old one control object with new assumptions
-    if not self.__ruleActivityProgram:
-      self.__ruleActivityProgram = RuleActivityProgram(self.__programObserver)
-    return self.__ruleActivityProgram
+  def ruleActivity(self):
+    # on first call, creates evaluator for the rules of the program
+    # otherwise reuses it
+    if not self.__ruleActivity:
+      self.__ruleActivity = RuleActivityEvaluator(self.__programObserver)
+    return self.__ruleActivity
 
   def checkProgram(self):
     # on first call, creates control object and fills with program
@@ -664,3 +841,59 @@ class ExplicitFLPChecker(FLPCheckerBase):
     if not self.__checkProgram:
       self.__checkProgram = CheckOptimizedProgram(self.__programObserver, self.__propfactory)
     return self.__checkProgram
+
+class UnfoundedSetFLPChecker(FLPCheckerBase):
+  """
+  FLP checker that searches for unfounded sets among the atoms on cycles through external atoms
+  (see UnfoundedSetCheckProgram) and accepts all answer sets if there are no such atoms
+
+  cyclicPredicates (if not None) restricts the search for these atoms to atoms of the given predicates
+  """
+  def __init__(self, propagatorFactory, cyclicPredicates=None):
+    logging.debug("initializing unfounded set FLP checker")
+    self.__propfactory = propagatorFactory
+    self.__cyclicPredicates = cyclicPredicates
+    # we cannot initialize this in an eager way,
+    # because we cannot force clingo to finish instantiation without running solve()
+    self.__checkProgram = None
+    self.__analyzed = False
+    self.__programObserver = None
+    # whether to explain FLP checking in logging (only if the explanation is shown)
+    self.explain = tracing.infoEnabled()
+    # running number for explanations
+    self.explainID = 1
+
+  def attach(self, clingocontrol):
+    self.__programObserver = GroundProgramObserver()
+    clingocontrol.register_observer(self.__programObserver)
+
+  def checkModel(self, mdl):
+    '''
+    is called from the on_model callback of clingo
+    '''
+    # returns True if mdl passes the FLP check (= is an answer set)
+    checkProgram = self.checkProgram()
+    if checkProgram is None:
+      return True
+    is_answer_set = checkProgram.checkUnfoundedSet(mdl, self.explain, self.explainID)
+    if self.explain:
+      expl = { True:'IS', False:'is NOT' }
+      logging.info("UFS check (#{}) returned {} (compatible set {} an answer set)".format(
+        self.explainID, repr(is_answer_set), expl[is_answer_set]))
+      self.explainID += 1
+    return is_answer_set
+
+  def checkProgram(self):
+    # on first call, analyzes the ground program and creates control object if there are cyclic atoms
+    # otherwise reuses old one control object (or None) with new assumptions
+    if not self.__analyzed:
+      self.__analyzed = True
+      po = self.__programObserver
+      replinputs = replacementInputAtoms(po)
+      cyclic = externalCycleAtoms(po, replinputs, self.__cyclicPredicates)
+      if len(cyclic) == 0:
+        logging.info("no external atom is on a cycle: compatible sets are answer sets, skipping UFS check")
+      else:
+        logging.info("UFS check is restricted to %d atoms on cycles through external atoms", len(cyclic))
+        self.__checkProgram = UnfoundedSetCheckProgram(po, cyclic, replinputs, self.__propfactory)
+    return self.__checkProgram
@@ -0,0 +1,170 @@
+# encoding: utf8
+# This module provides a persistent cache for results of external atoms that are evaluated in grounding.
+
+# HEXLite Python-based solver for a fragment of HEX
+# Copyright (C) 2017  Peter Schueller <schueller.p@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import json
+import hashlib
+import logging
+import sqlite3
+
+import dlvhex
+
+# assume that the main program has handled possible import problems
+import clingo
+
+class PersistentEAtomCache:
+  '''
+  sqlite database in a user-specified directory that stores
+  input tuple -> output tuples
+  for external atoms that
+  * have no predicate inputs (they are evaluated during grounding), and
+  * are marked as deterministic in their ExtSourceProperties.
+
+  Results are stored per plugin module name and per hash of the module source file,
+  so changing a plugin invalidates its cached results.
+
+  New results are committed in batches, so the database is locked only briefly
+  and several processes can share one cache directory.
+  If the database cannot be used, external atoms are evaluated without persistent cache.
+  '''
+  FILENAME = 'eatomcache.sqlite'
+  # seconds to wait for a database that is locked by another process
+  TIMEOUT = 30.0
+  # number of new results that are committed together
+  BATCH = 100
+
+  def __init__(self, directory):
+    # key = module name
+    # value = hash of module source or None (not cacheable)
+    self.versions = {}
+    # key = (module name, eatom name)
+    # value = dict:
+    #   key = serialized input tuple
+    #   value = serialized output
+    self.loaded = {}
+    # rows that are not yet committed
+    self.pending = []
+    self.hits = 0
+    self.misses = 0
+    self.stored = 0
+    self.db = None
+    try:
+      if not os.path.isdir(directory):
+        os.makedirs(directory)
+      path = os.path.join(directory, self.FILENAME)
+      logging.info('using persistent external atom cache %s', path)
+      self.db = sqlite3.connect(path, timeout=self.TIMEOUT)
+      with self.db:
+        self.db.execute(
+          'CREATE TABLE IF NOT EXISTS results ('
+          'module TEXT, version TEXT, eatom TEXT, input TEXT, output TEXT, '
+          'PRIMARY KEY (module, version, eatom, input))')
+    except (OSError, sqlite3.Error) as e:
+      self.disable(e)
+
+  def disable(self, error):
+    '''
+    stop using the database (results that are not committed are lost)
+    '''
+    logging.warning('persistent external atom cache disabled: %s', error)
+    if self.db is not None:
+      try:
+        self.db.close()
+      except sqlite3.Error:
+        pass
+    self.db = None
+    self.pending = []
+
+  def moduleVersion(self, module):
+    if module.__name__ not in self.versions:
+      version = None
+      source = getattr(module, '__file__', None)
+      if source is not None and os.path.isfile(source):
+        with open(source, 'rb') as f:
+          version = hashlib.sha1(f.read()).hexdigest()
+      else:
+        logging.info('cannot cache results of plugin module %s persistently (no source file)', module.__name__)
+      self.versions[module.__name__] = version
+    return self.versions[module.__name__]
+
+  def isCacheable(self, holder):
+    return (
+      self.db is not None and
+      holder.props.deterministic and
+      dlvhex.PREDICATE not in holder.inspec and
+      self.moduleVersion(holder.module) is not None)
+
+  def storage(self, holder):
+    key = (holder.module.__name__, holder.name)
+    if key not in self.loaded:
+      rows = []
+      if self.db is not None:
+        try:
+          rows = self.db.execute(
+            'SELECT input, output FROM results WHERE module=? AND version=? AND eatom=?',
+            (holder.module.__name__, self.moduleVersion(holder.module), holder.name)).fetchall()
+        except sqlite3.Error as e:
+          self.disable(e)
+      self.loaded[key] = dict(rows)
+    return self.loaded[key]
+
+  def lookup(self, holder, inputtuple):
+    '''
+    returns list of output tuples of clingo.Symbol or None if there is no stored result
+    '''
+    output = self.storage(holder).get(self.serializeInput(inputtuple), None)
+    if output is None:
+      self.misses += 1
+      return None
+    self.hits += 1
+    return [ tuple([ clingo.parse_term(term) for term in otuple ]) for otuple in json.loads(output) ]
+
+  def store(self, holder, inputtuple, outKnownTrue):
+    sinput = self.serializeInput(inputtuple)
+    soutput = json.dumps([ [ str(term) for term in otuple ] for otuple in outKnownTrue ])
+    self.storage(holder)[sinput] = soutput
+    if self.db is None:
+      return
+    self.pending.append((holder.module.__name__, self.moduleVersion(holder.module), holder.name, sinput, soutput))
+    self.stored += 1
+    if len(self.pending) >= self.BATCH:
+      self.commit()
+
+  def commit(self):
+    '''
+    write pending results in one transaction
+    '''
+    if self.db is None or len(self.pending) == 0:
+      return
+    try:
+      with self.db:
+        self.db.executemany('INSERT OR REPLACE INTO results VALUES (?,?,?,?,?)', self.pending)
+      self.pending = []
+    except sqlite3.Error as e:
+      self.disable(e)
+
+  def serializeInput(self, inputtuple):
+    return json.dumps([ str(term) for term in inputtuple ])
+
+  def close(self):
+    self.commit()
+    if self.db is not None:
+      self.db.close()
+      self.db = None
+    logging.info('persistent external atom cache: %d hits, %d misses, %d stored', self.hits, self.misses, self.stored)
@@ -19,6 +19,7 @@
 
 import pprint
 import logging
+import collections
 
 # the . module is called hexlite but we cannot import it, so we use the common trick in hexlite/__init__.py
 # see https://stackoverflow.com/questions/3078927/python-how-to-access-variable-declared-in-parent-module
@@ -26,6 +27,7 @@ from . import common as hexlite
 from . import ast
 from .ast import shallowparser as shp
 from . import aux
+from . import tracing
 Aux = aux.Aux
 
 import dlvhex
@@ -49,16 +51,66 @@ class ProgramRewriter:
       stm.rewrite()
     if not self.pcontext.wroteMaxint and self.config.maxint is not None:
       maxintConst = shp.alist(['#const', Aux.MAXINT, '=', self.config.maxint], right='.')
-      logging.info("adding maxint rule (from commandline) "+shp.shallowprint(maxintConst))
+      tracing.info("adding maxint rule (from commandline) %s", tracing.lazy(shp.shallowprint, maxintConst))
       self.addRewrittenRule(maxintConst)
+    self.analyzeDependencies()
     return self.rewritten, self.facts
 
   def addRewrittenRule(self, stm):
     'called by child statement rewriters to register rules'
     # XXX handle duplicate rules here
-    logging.info("adding rewritten rule "+shp.shallowprint(stm))
+    tracing.info("adding rewritten rule %s", tracing.lazy(shp.shallowprint, stm))
     self.rewritten.append(stm)
 
+  def analyzeDependencies(self):
+    '''
+    computes the strongly connected components of the predicate dependency graph of the rewritten program
+    that contain an external atom (i.e., a replacement predicate) and stores them in pcontext.eatomCycles
+
+    the graph has an edge from each head predicate to each predicate in the body (positive and negative)
+    and an edge from each replacement predicate to each predicate given as its predicate input
+
+    compatible sets of programs without such components are answer sets, so the FLP check can be skipped
+    '''
+    successors = collections.defaultdict(set)
+    for stm in self.rewritten:
+      if isinstance(stm, list) and len(stm) == 2 and isinstance(stm[0], shp.alist) and stm[0].sep == ':~':
+        # weak constraint
+        continue
+      if not isinstance(stm, shp.alist) or stm.right != '.' or stm.sep not in [None, ':-']:
+        logging.info('cannot analyze dependencies of statement %s (FLP check will not be simplified)', shp.shallowprint(stm))
+        return
+      if stm.sep is None and (isinstance(stm[0], str) or (not isinstance(stm[0], shp.alist) and
+                                                          isinstance(stm[0][0], str) and stm[0][0].startswith('#'))):
+        # directive
+        continue
+      if stm[0] is None:
+        # constraint
+        continue
+      heads = predicatesIn(stm[0])
+      if stm.sep == ':-':
+        body = predicatesIn(stm[1])
+      else:
+        body = set()
+      for head in heads:
+        successors[head].update(body)
+
+    replacementPreds = set([ siginfo.replacementPred for signatures in self.pcontext.eatoms.values() for siginfo in signatures ])
+    for replacementPred in replacementPreds:
+      inputs = self.pcontext.eatomInputs[replacementPred]
+      if None in inputs:
+        # unknown predicate input: may depend on every predicate
+        inputs = set(successors.keys())
+      successors[replacementPred].update(inputs)
+
+    self.pcontext.eatomCycles = [ set(component)
+      for component in hexlite.stronglyConnectedComponents(list(successors.keys()), successors)
+      if len(component) > 1 and any([ pred in replacementPreds for pred in component ]) ]
+    if len(self.pcontext.eatomCycles) == 0:
+      logging.info('no cycles through external atoms')
+    for component in self.pcontext.eatomCycles:
+      logging.info('cycle through external atoms in component %s', ','.join(sorted(component)))
+
   def __annotateWithStatementRewriters(self):
     '''
     collect statements from shallowprog
@@ -69,20 +121,20 @@ class ProgramRewriter:
     ret = []
     facts = []
     for stm in self.shallowprog:
-      dbgstm = pprint.pformat(stm, width=1000)
-      logging.debug('ASR stm='+dbgstm)
+      dbgstm = tracing.pformat(stm, width=1000)
+      tracing.debug('ASR stm=%s', dbgstm)
       if isinstance(stm, shp.alist):
         sig = (stm.left, stm.sep, stm.right)
         #logging.debug('ASR alist {}'.format(repr(sig)))
         if sig == (None, None, '.'):
           if len(stm) == 1 and isinstance(stm[0], list) and isinstance(stm[0][0], str) and stm[0][0].startswith('#'):
             # hash-instruction
-            logging.debug('ASR hash %s', dbgstm)
+            tracing.debug('ASR hash %s', dbgstm)
             ret.append(StatementRewriterHash(self, stm))
             continue
           else:
             # fact (maybe disjunctive) (parsed as :-separated list or as list with | or v inside)
-            logging.debug('ASR fact/passthrough %s', dbgstm)
+            tracing.debug('ASR fact/passthrough %s', dbgstm)
             ret.append(StatementRewriterHead(self, stm))
             facts.append(stm)
             continue
@@ -104,16 +156,15 @@ class ProgramRewriter:
         #  continue
         elif sig == (None, ':-', '.'):
           # rule/constraint
-          logging.debug('ASR rule/rulecstr %s', dbgstm)
+          tracing.debug('ASR rule/rulecstr %s', dbgstm)
           ret.append(StatementRewriterRuleCstr(self, stm))
           continue
         elif sig == (None, ':~', '.'):
           # weak constraint without weights (with weights would be caught below)
           defaultweight = shp.alist([['1'], ['1']], left='[', right=']', sep=':')
           extendedWeakConstraint = [stm, defaultweight]
-          if __debug__:
-            logging.debug('ASR extended weak constraint {} into {}'.format(
-              dbgstm, pprint.pformat(extendedWeakConstraint)))
+          tracing.debug('ASR extended weak constraint %s into %s',
+            dbgstm, tracing.pformat(extendedWeakConstraint))
           ret.append(StatementRewriterWeakCstr(self, extendedWeakConstraint))
           continue
       elif isinstance(stm, list) and len(stm) == 2:
@@ -127,6 +178,37 @@ class ProgramRewriter:
     return ret, facts
 
 
+def predicateName(structure):
+  '''
+  returns the predicate name given as predicate input in shallow parse structure (None if it is no constant)
+  '''
+  if isinstance(structure, list) and len(structure) == 1 and isinstance(structure[0], str) and isIdentifier(structure[0]):
+    return structure[0]
+  return None
+
+def isIdentifier(s):
+  return len(s) > 0 and s[0].islower() and s.replace('_', 'a').isalnum() and s not in ['not', 'v']
+
+def predicatesIn(structure):
+  '''
+  returns the set of predicate names in a shallow parse of a head or body
+  (this overapproximates: constants outside of argument lists, e.g., in aggregate elements, are also returned)
+  '''
+  ret = set()
+  def visit(x):
+    if isinstance(x, shp.alist) and x.left == '(':
+      # arguments (and tuples) contain no predicates
+      return
+    if isinstance(x, str):
+      name = x.lstrip('-')
+      if isIdentifier(name):
+        ret.add(name)
+    elif isinstance(x, list):
+      for elem in x:
+        visit(elem)
+  visit(structure)
+  return ret
+
 class EAtomHandlerBase:
   def __init__(self, pcontext, holder):
     assert(isinstance(pcontext, hexlite.ProgramContext))
@@ -173,7 +255,7 @@ class PureInstantiationEAtomHandler(EAtomHandlerBase):
       replacement.append(shp.alist(eatom['outputs'], '(', ')', ','))
     # find position of eatom in body list
     posInStatement = statement[1].index(eatom['shallow'])
-    logging.info('PIEAH replacing eatom '+shp.shallowprint(eatom['shallow'])+' by '+shp.shallowprint(replacement))
+    tracing.info('PIEAH replacing eatom %s by %s', tracing.lazy(shp.shallowprint, eatom['shallow']), tracing.lazy(shp.shallowprint, replacement))
     statement[1][posInStatement] = replacement
     remainingEatoms = ast.deepCollect(statement, lambda x: isinstance(x, str) and x.startswith('&'))
     #assert(logging.debug('PIEAH remainingEatoms='+repr(remainingEatoms)) or True)
@@ -195,10 +277,9 @@ class PregroundableOutputEAtomHandler(EAtomHandlerBase):
     * transforms eatom in statement into auxiliary atom with all inputs and outputs
     * creates a rule for guessing truth of the auxiliary eatom based on the auxiliary input tuple
     '''
-    if __debug__:
-      logging.debug('NOEAH eatom {} with safevars {} and safeconditions {}'.format(
-        pprint.pformat(eatom), repr(safevars), pprint.pformat(safeconditions)))
-      logging.debug('NOEAH in statement '+pprint.pformat(statement))
+    tracing.debug('NOEAH eatom %s with safevars %r and safeconditions %s',
+      tracing.pformat(eatom), safevars, tracing.pformat(safeconditions))
+    tracing.debug('NOEAH in statement %s', tracing.pformat(statement))
     out = []
 
     # raise an exception if outputs are non-safe variables (this case will for sure not work)
@@ -216,6 +297,9 @@ class PregroundableOutputEAtomHandler(EAtomHandlerBase):
     valueAuxPred = aux.predEAtomTruth(arity, eatom['name'])
     valueAuxAtom = [ valueAuxPred, shp.alist(args, left='(', right=')', sep=',') ]
     self.pcontext.addSignature(eatom['name'], relAuxPred, valueAuxPred, arity)
+    # predicate inputs are dependencies of the external atom (for the dependency analysis)
+    self.pcontext.addPredicateInputs(valueAuxPred, [ predicateName(inp)
+      for inp, argtype in zip(eatom['inputs'], self.holder.inspec) if argtype == dlvhex.PREDICATE ])
 
     # create input instantiation rule for eatom value based on safeconditions
     # (this also determines if the atom needs to be guessed)
@@ -225,25 +309,25 @@ class PregroundableOutputEAtomHandler(EAtomHandlerBase):
     else:
       # rule
       relevanceRule = shp.alist([ relAuxAtom, shp.alist(safeconditions, sep=',') ], sep=':-', right='.')
-    logging.debug('NOEAH relevanceRule={}'.format(shp.shallowprint(relevanceRule)))
+    tracing.debug('NOEAH relevanceRule=%s', tracing.lazy(shp.shallowprint, relevanceRule))
     out.append(relevanceRule)
 
     # create guessing rule for eatom value based on safeconditions
     valueGuessHead = [ shp.alist([ valueAuxAtom ], left='{', right='}', sep=';') ]
     valueGuessRule = shp.alist([ valueGuessHead, shp.alist([relAuxAtom], sep=',') ], sep=':-', right='.')
-    logging.debug('NOEAH valueGuessRule={}'.format(shp.shallowprint(valueGuessRule)))
+    tracing.debug('NOEAH valueGuessRule=%s', tracing.lazy(shp.shallowprint, valueGuessRule))
     out.append(valueGuessRule)
 
     # replace eatom in statement
     replacement = eatom['prefix'] + valueAuxAtom
     # find position of eatom in body list
     posInStatement = statement[1].index(eatom['shallow'])
-    logging.info('NOEAH replacing eatom '+shp.shallowprint(eatom['shallow'])+' by '+shp.shallowprint(replacement))
+    tracing.info('NOEAH replacing eatom %s by %s', tracing.lazy(shp.shallowprint, eatom['shallow']), tracing.lazy(shp.shallowprint, replacement))
     statement[1][posInStatement] = replacement
 
     # find out if rule is completely rewritten XXX maybe the caller should decide this?
     remainingEatoms = ast.deepCollect(statement, lambda x: isinstance(x, str) and x.startswith('&'))
-    assert(logging.debug('NOEAH remainingEatoms='+repr(remainingEatoms)) or True)
+    tracing.debug('NOEAH remainingEatoms=%r', remainingEatoms)
     if len(remainingEatoms) == 0:
       out.append(statement)
 
@@ -308,12 +392,10 @@ class StatementRewriterBase:
         else:
           # rewrite
           # #int(Term) becomes Term = 0..aux_maxint
-          if __debug__:
-            orig = list(elem)
+          orig = list(elem)
           term = elem[1][0]
           elem[:] = [term, '=', '0', '..', Aux.MAXINT]
-          if __debug__:
-            logging.debug("rewrote {} to {}".format(pprint.pformat(orig), pprint.pformat(elem)))
+          tracing.debug("rewrote %s to %s", tracing.pformat(orig), tracing.pformat(elem))
     ast.dfVisit(self.statement, rewriteIfApplicable)
 
 class StatementRewriterPassthrough(StatementRewriterBase):
@@ -338,7 +420,7 @@ class StatementRewriterHash(StatementRewriterBase):
   def rewrite(self):
     #self.rewriteInt()
     base = self.statement[0]
-    logging.debug('SRH base '+pprint.pformat(base))
+    tracing.debug('SRH base %s', tracing.pformat(base))
     if base[0] == '#maxint':
       # replace the first part with a const declaration (this way there can be a formula to the right of '=')
       self.statement[0][0:1] = ['#const', Aux.MAXINT]
@@ -355,14 +437,14 @@ class StatementRewriterHead(StatementRewriterBase):
   def __init__(self, pr, statement):
     StatementRewriterBase.__init__(self, pr, statement)
   def rewrite(self):
-    logging.debug('SRH stm='+pprint.pformat(self.statement))
+    tracing.debug('SRH stm=%s', tracing.pformat(self.statement))
     #self.rewriteInt()
     assert(isinstance(self.statement, shp.alist))
     assert(len(self.statement) == 1) # we have no body (otherwise use StatementRewriterRuleCstr)
     self.statement[0] = self.rewriteDisjunctiveHead(self.statement[0])
     self.pr.addRewrittenRule(self.statement)
   def rewriteDisjunctiveHead(self, head):
-    logging.debug('SRH head='+pprint.pformat(head))
+    tracing.debug('SRH head=%s', tracing.pformat(head))
     # if head is a normal list that contains more than 2 elements and some 'v' items on top level,
     # transform it into an alist with separator '|' instead of 'v'
     # FIXME this represents v-separated lists as alist<;|;> and |-separated lists as alist<;;>([X,|,Y,...]) which is weird
@@ -383,7 +465,7 @@ class StatementRewriterHead(StatementRewriterBase):
       parts.append(current)
       if len(parts) > 1:
         ret = shp.alist(parts, sep='|')
-    logging.debug('SRH ret='+pprint.pformat(ret))
+    tracing.debug('SRH ret=%s', tracing.pformat(ret))
     return ret
 
 class StatementRewriterRuleCstr(StatementRewriterHead):
@@ -394,8 +476,7 @@ class StatementRewriterRuleCstr(StatementRewriterHead):
     StatementRewriterHead.__init__(self, pr, statement)
 
   def rewrite(self):
-    if __debug__:
-      logging.debug('SRRC stm='+pprint.pformat(self.statement, width=1000))
+    tracing.debug('SRRC stm=%s', tracing.pformat(self.statement, width=1000))
     self.rewriteInt()
     self.statement[0] = self.rewriteDisjunctiveHead(self.statement[0])
     body = self.statement[1]
@@ -406,9 +487,9 @@ class StatementRewriterRuleCstr(StatementRewriterHead):
     else:
       while len(pendingEatoms) > 0:
         #logging.debug('SRRC pendingEatoms='+pprint.pformat(pendingEatoms))
-        logging.debug('SRRC safeVars='+pprint.pformat(safeVars))
+        tracing.debug('SRRC safeVars=%s', tracing.pformat(safeVars))
         safeEatm, makesSafe = self.pickSafeExternalAtom(pendingEatoms, safeVars)
-        logging.debug('SRRC safeEatm='+pprint.pformat(safeEatm))
+        tracing.debug('SRRC safeEatm=%s', tracing.pformat(safeEatm))
         pendingEatoms.remove(safeEatm)
         handler = self.getExecutionHandler(safeEatm)
         safeConditions = self.findSafeConditions(self.statement[1], safeVars)
@@ -444,13 +525,13 @@ class StatementRewriterRuleCstr(StatementRewriterHead):
     * finds all variables in arguments of positive body literals
     * XXX there are some other cases that make variables safe (e.g., assignments)
     '''
-    logging.debug('SRRC findBasicSafeVariables for body '+pprint.pformat(body))
+    tracing.debug('SRRC findBasicSafeVariables for body %s', tracing.pformat(body))
     safetyGivingAtoms = ast.deepCollectAtDepth(body, lambda d: d == 1,
       lambda x:
         (x[0] != 'not') and # NAF
         not (isinstance(x[0],str) and x[0][0] == '&') # external atoms
       )
-    logging.debug('SRRC safetyGivingAtoms='+pprint.pformat(safetyGivingAtoms))
+    tracing.debug('SRRC safetyGivingAtoms=%s', tracing.pformat(safetyGivingAtoms))
     safeVars = ast.findVariables(safetyGivingAtoms)
     return set(safeVars)
 
@@ -498,8 +579,7 @@ class StatementRewriterRuleCstr(StatementRewriterHead):
     '''
     #logging.debug('body='+pprint.pformat(body))
     def splitPrefixEatom(x):
-      if __debug__:
-        logging.debug('splitPrefixEatom({})'.format(pprint.pformat(x)))
+      tracing.debug('splitPrefixEatom(%s)', tracing.pformat(x))
       if isinstance(x,shp.alist):
         # maybe expansion (lit : lit) or disjunction (lit ; lit)
         # TODO how about external atoms in expansions/disjunctions/aggregates?
@@ -552,8 +632,8 @@ class StatementRewriterWeakCstr(StatementRewriterRuleCstr):
     self.weak = statement[1]
 
   def rewrite(self):
-    logging.debug('SRWC stm='+pprint.pformat(self.statement))
-    logging.debug('SRWC weak='+pprint.pformat(self.weak))
+    tracing.debug('SRWC stm=%s', tracing.pformat(self.statement))
+    tracing.debug('SRWC weak=%s', tracing.pformat(self.weak))
     assert(self.statement[0] == None)
     body = self.statement[1]
     safeVars = self.findBasicSafeVariables(body)
@@ -578,7 +658,7 @@ class StatementRewriterWeakCstr(StatementRewriterRuleCstr):
         safeVars |= makesSafe
 
   def decorateWeak(self, stmt, safeVars):
-    logging.debug('SRWC decorateWeak='+pprint.pformat(self.weak))
+    tracing.debug('SRWC decorateWeak=%s', tracing.pformat(self.weak))
     assert(isinstance(self.weak, shp.alist))
     assert(self.weak.left == '[' and self.weak.right == ']')
     if self.weak.sep == ':':
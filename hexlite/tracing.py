@@ -0,0 +1,88 @@
+# encoding: utf8
+# This module provides logging helpers that defer formatting of log messages.
+
+# HEXLite Python-based solver for a fragment of HEX
+# Copyright (C) 2017  Peter Schueller <schueller.p@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Tracing facade for hot paths (propagator, FLP checker, rewriter).
+
+Messages use %-style placeholders, arguments are only converted to strings if the message is emitted:
+
+  tracing.debug('%s checking %s', name, tracing.pformat(interpretation))
+
+instead of
+
+  logging.debug(name+' checking {}'.format(pprint.pformat(interpretation)))
+
+which formats the interpretation even if debug logging is off.
+Code that has to compute something just for a message should be guarded by debugEnabled().
+'''
+
+import logging
+import pprint
+import sys
+
+_root = logging.getLogger()
+
+class Lazy:
+  '''
+  log message argument that calls function(*args) only when the message is formatted
+  '''
+  __slots__ = ('function', 'args')
+  def __init__(self, function, *args):
+    self.function = function
+    self.args = args
+  def __str__(self):
+    return str(self.function(*self.args))
+  def __repr__(self):
+    return self.__str__()
+
+def lazy(function, *args):
+  return Lazy(function, *args)
+
+def pformat(obj, **kwargs):
+  '''
+  lazy pprint.pformat(obj)
+  '''
+  return Lazy(lambda: pprint.pformat(obj, **kwargs))
+
+def join(separator, iterable, function=str):
+  '''
+  lazy separator.join(function(x) for x in iterable)
+  '''
+  return Lazy(lambda: separator.join([ function(x) for x in iterable ]))
+
+def debugEnabled():
+  return _root.isEnabledFor(logging.DEBUG)
+
+def infoEnabled():
+  return _root.isEnabledFor(logging.INFO)
+
+# stacklevel=2 reports the caller (not this module) as the source of the message
+# (the stacklevel argument exists only from Python 3.8 on)
+if sys.version_info >= (3, 8):
+  _callerArgs = { 'stacklevel': 2 }
+else:
+  _callerArgs = {}
+
+def debug(msg, *args):
+  if _root.isEnabledFor(logging.DEBUG):
+    _root.debug(msg, *args, **_callerArgs)
+
+def info(msg, *args):
+  if _root.isEnabledFor(logging.INFO):
+    _root.info(msg, *args, **_callerArgs)
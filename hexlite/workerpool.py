@@ -0,0 +1,125 @@
+# encoding: utf8
+# This module evaluates external atoms in worker processes.
+
+# HEXLite Python-based solver for a fragment of HEX
+# Copyright (C) 2017  Peter Schueller <schueller.p@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import logging
+import importlib
+import multiprocessing
+
+import dlvhex
+
+# assume that the main program has handled possible import problems
+import clingo
+
+class WorkerPool:
+  '''
+  Pool of worker processes that evaluate external atoms
+  which are marked with ExtSourceProperties.setParallelEvaluation(True).
+
+  Each worker loads the plugin modules itself (processes are spawned, not forked,
+  because forking the clingo process during search is not safe).
+  Evaluation requests are sent as strings:
+  * the input tuple, and
+  * the predicate input atoms with their truth values in the current assignment.
+  Results are parsed back into clingo symbols.
+  '''
+  def __init__(self, workers, pluginmodules):
+    logging.info('starting %d worker processes for external atom evaluation', workers)
+    context = multiprocessing.get_context('spawn')
+    self.pool = context.Pool(workers, _initializeWorker,
+      (list(sys.path), list(pluginmodules), logging.getLogger().getEffectiveLevel()))
+    self.submitted = 0
+
+  def submit(self, holder, inputtuple, predicateinputatoms, assignment):
+    '''
+    starts evaluation of holder in some worker process
+    returns a handle for result()
+    '''
+    self.submitted += 1
+    inputs = [ (str(x.symlit.sym), assignment.value(x.symlit.lit)) for x in predicateinputatoms ]
+    return self.pool.apply_async(_evaluateInWorker,
+      (holder.name, [ str(x) for x in inputtuple ], inputs))
+
+  def result(self, handle):
+    '''
+    waits for the evaluation and returns (known true tuples, unknown tuples) with clingo symbols
+    '''
+    outKnownTrue, outUnknown = handle.get()
+    return self.parseTuples(outKnownTrue), self.parseTuples(outUnknown)
+
+  def parseTuples(self, tuples):
+    return [ tuple([ clingo.parse_term(val) for val in _tuple ]) for _tuple in tuples ]
+
+  def close(self):
+    logging.info('worker processes evaluated %d external atoms', self.submitted)
+    self.pool.close()
+    self.pool.join()
+
+#
+# the following is executed in the worker processes
+#
+
+class _SnapshotAssignment:
+  '''
+  stands in for the clingo assignment in worker processes:
+  literal i+1 has the truth value of the i-th predicate input (None = unassigned)
+  '''
+  def __init__(self, values):
+    self.values = values
+  def value(self, lit):
+    val = self.values[abs(lit)-1]
+    if lit < 0 and val is not None:
+      val = not val
+    return val
+  def is_true(self, lit):
+    return self.value(lit) == True
+  def is_false(self, lit):
+    return self.value(lit) == False
+
+class _SnapshotControl:
+  def __init__(self, values):
+    self.assignment = _SnapshotAssignment(values)
+
+def _initializeWorker(syspath, pluginmodules, loglevel):
+  logging.getLogger().setLevel(loglevel)
+  for p in syspath:
+    if p not in sys.path:
+      sys.path.append(p)
+  for mname in pluginmodules:
+    pmodule = importlib.import_module(mname)
+    dlvhex.startRegistration(pmodule)
+    pmodule.register()
+
+def _evaluateInWorker(eatomname, inputtuple, inputs):
+  # import here because this module is imported by clingobackend
+  from . import clingobackend
+
+  class WorkerEAtomEvaluator(clingobackend.EAtomEvaluator):
+    def learn(self, ng):
+      logging.warning("learn() is ignored for external atom %s because it is evaluated in a worker process", eatomname)
+
+  ccontext = clingobackend.ClaspContext()
+  ccontext.propcontrol = _SnapshotControl([ value for _, value in inputs ])
+  predicateinputatoms = clingobackend.PredicateInputs([
+    clingobackend.ClingoID(ccontext, clingobackend.SymLit(clingo.parse_term(sym), idx+1))
+    for idx, (sym, _) in enumerate(inputs) ])
+  eaeval = WorkerEAtomEvaluator(ccontext)
+  outKnownTrue, outUnknown = eaeval.evaluate(dlvhex.eatoms[eatomname],
+    tuple([ clingo.parse_term(x) for x in inputtuple ]), predicateinputatoms)
+  return [ tuple([ str(x) for x in t ]) for t in outKnownTrue ], [ tuple([ str(x) for x in t ]) for t in outUnknown ]
@@ -12,7 +12,7 @@ def neg(p):
 	else:
 		for x in dlvhex.getTrueInputAtoms():
 			return
-                dlvhex.output(())
+		dlvhex.output(())
 
 def aOrNotB(a,b):
 
@@ -62,7 +62,7 @@ def parity(p):
 				if last:
 					ng = ng + (dlvhex.getInputAtoms()[-1], )
 				else:
-        	                        ng = ng + (dlvhex.getInputAtoms()[-1].negate(), )
+					ng = ng + (dlvhex.getInputAtoms()[-1].negate(), )
 
 				# generate nogood which implies that the external atom is true
 				supset = ng + (dlvhex.storeOutputAtom(()).negate(), )
@@ -73,8 +73,8 @@ def parity(p):
 				pos[inc] = not pos[inc]
 				while not overflow and not pos[inc]:
 					inc = inc + 1
-                                        if inc >= len(pos):
-                                                overflow = True
+					if inc >= len(pos):
+						overflow = True
 					else:
 						pos[inc] = not pos[inc]
 
@@ -186,7 +186,9 @@ def register():
 	prop.setCompletePositiveSupportSets(True)
 	dlvhex.addAtom("parity", (dlvhex.PREDICATE, ), 0, prop)
 
-	dlvhex.addAtom("fibonacci", (dlvhex.CONSTANT, ), 1)
+	prop = dlvhex.ExtSourceProperties()
+	prop.setDeterministic(True)
+	dlvhex.addAtom("fibonacci", (dlvhex.CONSTANT, ), 1, prop)
 
 	dlvhex.addAtom("date", (), 1)
 
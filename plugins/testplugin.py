@@ -3,6 +3,7 @@ import dlvhex
 import hexlite.ast.shallowparser as shp
 
 import logging
+import asyncio
 
 def id(p):
 	for x in dlvhex.getTrueInputAtoms():
@@ -286,6 +287,10 @@ def someSelectedPartial(selected):
 	if unknown:
 		dlvhex.outputUnknown(())
 
+def someSelectedMinimal(selected):
+	# same as someSelectedPartial but requests minimized nogoods
+	someSelectedPartial(selected)
+
 def someSelectedLearning(selected):
 	for x in dlvhex.getInputAtoms():
 		if x.tuple()[0] == selected and x.isTrue():
@@ -306,6 +311,25 @@ def testSetMinus(p, q):
 	for r in rset:
 		dlvhex.output( (r,) )
 
+def testSetMinusBatch(inputs):
+	# same as testSetMinus but evaluates all input tuples in one call
+	# (the predicate input contains the extensions of all predicates in all input tuples)
+	outputs = []
+	for p, q in inputs:
+		pset = set([ x[0].value() for x in p.extension() ])
+		qset = set([ x[0].value() for x in q.extension() ])
+		outputs.append([ (r,) for r in pset - qset ])
+	return outputs
+
+def testSetMinusParallel(p, q):
+	# same as testSetMinus but marked for evaluation in worker processes
+	testSetMinus(p, q)
+
+async def testSetMinusAsync(p, q):
+	# same as testSetMinus but waits like an I/O-bound source before producing output
+	await asyncio.sleep(0.01)
+	testSetMinus(p, q)
+
 def testSetMinusLearn(p, q):
 	# is true for all constants in extension of p but not in extension of q
 	# (same as testSetMinus)
@@ -392,8 +416,10 @@ def register():
 	#unused dlvhex.addAtom("testListSplit", (dlvhex.CONSTANT,dlvhex.CONSTANT), 2)
 	#unused dlvhex.addAtom("testListHalf", (dlvhex.CONSTANT,), 2)
 	#unused dlvhex.addAtom("testListMerge", (dlvhex.CONSTANT,dlvhex.CONSTANT,dlvhex.CONSTANT), 2)
-	dlvhex.addAtom("testSubstr", (dlvhex.CONSTANT,dlvhex.CONSTANT,dlvhex.CONSTANT), 1)
-	dlvhex.addAtom("testStrlen", (dlvhex.CONSTANT,), 1)
+	prop = dlvhex.ExtSourceProperties()
+	prop.setDeterministic(True)
+	dlvhex.addAtom("testSubstr", (dlvhex.CONSTANT,dlvhex.CONSTANT,dlvhex.CONSTANT), 1, prop)
+	dlvhex.addAtom("testStrlen", (dlvhex.CONSTANT,), 1, prop)
 	dlvhex.addAtom("testSmallerThan", (dlvhex.CONSTANT,dlvhex.CONSTANT), 0)
 	dlvhex.addAtom("testEven", (dlvhex.PREDICATE,dlvhex.PREDICATE), 0)
 	#unused dlvhex.addAtom("testOdd", (dlvhex.PREDICATE,dlvhex.PREDICATE), 0)
@@ -403,8 +429,16 @@ def register():
 	#XFAIL partial dlvhex.addAtom("idp", (dlvhex.PREDICATE,), 1)
 	dlvhex.addAtom("idc", (dlvhex.CONSTANT,), 1)
 	#TODO testCautiousQuery
-	dlvhex.addAtom("testSetMinus", (dlvhex.PREDICATE,dlvhex.PREDICATE), 1)
+	prop = dlvhex.ExtSourceProperties()
+	prop.addMonotonicInputPredicate(0)
+	prop.addAntimonotonicInputPredicate(1)
+	dlvhex.addAtom("testSetMinus", (dlvhex.PREDICATE,dlvhex.PREDICATE), 1, prop)
 	dlvhex.addAtom("testSetMinusLearn", (dlvhex.PREDICATE,dlvhex.PREDICATE), 1)
+	dlvhex.addBatchAtom("testSetMinusBatch", (dlvhex.PREDICATE,dlvhex.PREDICATE), 1)
+	prop = dlvhex.ExtSourceProperties()
+	prop.setParallelEvaluation(True)
+	dlvhex.addAtom("testSetMinusParallel", (dlvhex.PREDICATE,dlvhex.PREDICATE), 1, prop)
+	dlvhex.addAtom("testSetMinusAsync", (dlvhex.PREDICATE,dlvhex.PREDICATE), 1)
 
 	dlvhex.addAtom("testNonmon", (dlvhex.PREDICATE,), 1)
 	dlvhex.addAtom("testNonmon2", (dlvhex.PREDICATE,), 1)
@@ -441,6 +475,10 @@ def register():
 	prop = dlvhex.ExtSourceProperties()
 	prop.setProvidesPartialAnswer(True)
 	dlvhex.addAtom("someSelectedPartial", (dlvhex.PREDICATE,), 0, prop)
+	prop = dlvhex.ExtSourceProperties()
+	prop.setProvidesPartialAnswer(True)
+	prop.setMinimizeNogoods(True)
+	dlvhex.addAtom("someSelectedMinimal", (dlvhex.PREDICATE,), 0, prop)
 
 	#XFAIL (TODO) sumD0
 	#XFAIL getreq
@@ -69,6 +69,8 @@ ANSWERSETCOMPARE=./answerset_compare.py
 MKTEMP="mktemp -t tmp.XXXXXXXXXX"
 TMPFILE=$($MKTEMP) # global temp. file for answer sets
 ETMPFILE=$($MKTEMP) # global temp. file for errors
+EATOMCACHEDIR=./eatomcache.tmp # persistent external atom cache (tests with --eatomcachedir start cold)
+rm -rf $EATOMCACHEDIR
 
 passed=0
 failed=0
@@ -201,6 +203,7 @@ done
 # cleanup
 rm -f $TMPFILE
 rm -f $ETMPFILE
+rm -rf $EATOMCACHEDIR
 
 echo ========== dlvhex tests completed ==========
 